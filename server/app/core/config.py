@@ -32,6 +32,61 @@ class Settings(BaseSettings):
     # Model Settings
     MODEL_DIR: str = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "models")
     
+    # Disease Inference
+    DISEASE_ML_ENABLED: bool = True  # false on API-only workers: disease routes answer 503, torch is never imported
+    DISEASE_PRELOAD: bool = False  # load and warm up the model at startup instead of on the first disease request
+    DISEASE_WARMUP_ITERATIONS: int = 3  # dummy forward passes per warm-up batch size
+    DISEASE_REGISTRY_FILE: str = ""  # model registry manifest; defaults to MODEL_DIR/model_registry.json (must be writable to activate versions)
+    DISEASE_REGISTRY_POLL_SECONDS: float = 30.0  # how often workers check model_registry.json for a new active version; 0 disables
+    DISEASE_SWAP_DRAIN_TIMEOUT: float = 60.0  # seconds to wait for in-flight batches before releasing the old model
+    DISEASE_JOB_MAX_PENDING: int = 200  # queued jobs (with their image bytes) before submissions get 503
+    DISEASE_JOB_MAX_PENDING_BYTES: int = 64 * 1024 * 1024  # image bytes held by unfinished jobs, per worker, before submissions get 503
+    DISEASE_JOB_MAX_JOBS: int = 10000  # job records retained in memory
+    DISEASE_JOB_TTL: int = 3600  # seconds a job and its result stay available for polling
+    DISEASE_JOB_CONCURRENCY: int = 16  # jobs handed to the batcher at once
+    DISEASE_JOB_DIR: str = ""  # shared directory for job state so any worker can answer polls; empty uses a temp directory when several workers run
+    DISEASE_QUALITY_GATE: bool = False  # reject blurry, badly exposed or leafless images before inference
+    DISEASE_QUALITY_MIN_SHARPNESS: float = 10.0  # Laplacian variance of the 112x112 luma
+    DISEASE_QUALITY_MIN_BRIGHTNESS: float = 25.0  # mean luma, 0-255
+    DISEASE_QUALITY_MAX_BRIGHTNESS: float = 240.0
+    DISEASE_QUALITY_MIN_LEAF_RATIO: float = 0.03  # fraction of green / yellow-green pixels
+    DISEASE_TILE_OVERLAP: float = 0.25  # fraction of a 224px tile shared with its neighbour in tiled mode
+    DISEASE_TILE_MAX_SIDE: int = 1344  # large images are scaled down to this long side before tiling
+    DISEASE_TILE_MIN_CONFIDENCE: float = 0.4  # tiles below this confidence don't count towards a disease verdict
+    DISEASE_CASCADE_ENABLED: bool = False  # answer with the distilled <model>.student.pth first, escalate uncertain images
+    DISEASE_CASCADE_MIN_CONFIDENCE: float = 0.7  # student top-1 probability needed to skip the full model
+    DISEASE_CASCADE_MIN_MARGIN: float = 0.2  # student top-1 minus top-2 probability needed to skip the full model
+    DISEASE_SHADOW_VERSION: str = ""  # registry version to evaluate against production on live traffic; empty disables shadow mode
+    DISEASE_SHADOW_SAMPLE_RATE: float = 0.05  # fraction of served images also run through the shadow model
+    DISEASE_SHADOW_QUEUE_SIZE: int = 32  # samples waiting for the shadow model; more are dropped
+    DISEASE_SHADOW_LOG_FILE: str = ""  # append one JSON record per shadow comparison
+    MODEL_ADMIN_TOKEN: str = ""  # X-Admin-Token for the model registry endpoints; empty disables them
+    DISEASE_PRELOAD_BEFORE_FORK: bool = False  # load in the gunicorn master (preload_app) so workers share weights copy-on-write
+    DISEASE_WEIGHTS_MMAP: bool = False  # memory-map the .pt weights so all workers share one page-cache copy
+    DISEASE_BATCH_WINDOW_MS: float = 10.0  # how long to wait for more requests before a forward pass
+    DISEASE_MAX_BATCH_SIZE: int = 16
+    DISEASE_INFERENCE_WORKERS: int = 1  # threads running preprocessing and forward passes
+    DISEASE_INFERENCE_QUEUE_DEPTH: int = 64  # requests allowed in the pipeline (decode, queue, forward pass) before new ones are rejected
+    DISEASE_BULK_BATCH_SIZE: int = 32  # forward-pass batch size for tiled analysis
+    DISEASE_BATCH_BUFFERS: int = 2  # preallocated input batch tensors reused across forward passes; 0 allocates one per batch
+    DISEASE_MAX_IMAGES_PER_REQUEST: int = 100
+    DISEASE_FAST_DECODE: bool = False  # use JPEG draft mode to decode close to 224x224 before resizing
+    DISEASE_CACHE_ENABLED: bool = True
+    DISEASE_CACHE_SIZE: int = 512
+    DISEASE_CACHE_TTL: int = 3600  # seconds
+    DISEASE_CACHE_DIR: str = ""  # set to a directory to keep cached predictions across restarts
+    DISEASE_CACHE_DIR_MAX_FILES: int = 10000  # oldest cache files beyond this are deleted by the periodic purge
+    DISEASE_QUANTIZE: bool = False  # dynamic int8 quantization of the model's linear layers
+    DISEASE_CPU_OPTIMIZATION: str = "off"  # eager PyTorch model: "off", "channels_last" (conv-bn folding, NHWC, inference_mode) or "frozen" (also freeze + oneDNN fusion)
+    DISEASE_USE_TORCHSCRIPT: bool = True  # prefer a frozen <model>.torchscript artifact when one exists (not with DISEASE_QUANTIZE)
+    DISEASE_INFERENCE_BACKEND: str = "torch"  # "torch" or "onnxruntime" (needs <model>.onnx)
+    DISEASE_ORT_INTRA_OP_THREADS: int = 0  # 0 uses the thread budget
+    DISEASE_SERVER_WORKERS: int = 0  # server worker processes per container; 0 reads WEB_CONCURRENCY
+    DISEASE_TORCH_THREADS: int = 0  # intra-op threads per forward pass; 0 derives it from the CPU quota
+    DISEASE_TORCH_INTEROP_THREADS: int = 1
+    DISEASE_DEBUG_LOGGING: bool = False  # emit per-prediction diagnostic records at DEBUG level
+    DISEASE_LOG_SAMPLE_RATE: float = 0.1  # fraction of predictions that get a diagnostic record in debug mode
+    
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
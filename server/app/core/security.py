@@ -2,7 +2,8 @@ from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 import hashlib
-from fastapi import HTTPException, status, Depends
+import secrets
+from fastapi import HTTPException, status, Depends, Header
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.core.config import settings
 from app.schemas.user import TokenData
@@ -48,3 +49,16 @@ def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security))
         raise credentials_exception
     
     return token_data
+
+def verify_admin_token(x_admin_token: Optional[str] = Header(None)):
+    """Check the X-Admin-Token header against settings.MODEL_ADMIN_TOKEN."""
+    if not settings.MODEL_ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Model administration is disabled"
+        )
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, settings.MODEL_ADMIN_TOKEN):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid admin token"
+        )
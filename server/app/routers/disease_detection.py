@@ -1,34 +1,125 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, Response, status, UploadFile, File
+from fastapi.routing import APIRoute
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models.disease_detection import DiseaseDetection, CropRecommendation
 from app.models.user import User
 from app.schemas.disease_detection import (
     DiseaseDetectionRequest, 
+    DiseaseBatchDetectionRequest,
     DiseaseDetectionResponse,
     CropRecommendationRequest,
-    CropRecommendationResponse
+    CropRecommendationResponse,
+    ModelVersionCreate
 )
-from app.core.security import verify_token
-from app.services.disease_detection import disease_detection_service
+from app.core.security import verify_token, verify_admin_token
+from app.core.config import settings
+from app.services.disease_detection import disease_detection_service, DiseaseServiceUnavailable
+from app.services.inference_queue import disease_inference_queue, InferenceQueueFull
+from app.services.disease_jobs import disease_job_queue, JobQueueFull
+from app.services.model_registry import model_registry
+from app.services.thread_budget import thread_budget
 from app.services.weather import weather_service
 from typing import List
 import json
 
-router = APIRouter()
+UPLOAD_CHUNK_SIZE = 256 * 1024
+# Room for the multipart boundaries and part headers around the image
+MULTIPART_OVERHEAD = 64 * 1024
+
+def _upload_too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Image exceeds maximum size of {settings.MAX_FILE_SIZE // (1024 * 1024)}MB"
+    )
+
+class UploadLimitRoute(APIRoute):
+    """Rejects multipart uploads whose Content-Length exceeds MAX_FILE_SIZE before the form is parsed"""
+    
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        
+        async def limited_handler(request: Request) -> Response:
+            content_length = request.headers.get("content-length", "")
+            if (
+                request.headers.get("content-type", "").startswith("multipart/form-data")
+                and content_length.isdigit()
+                and int(content_length) > settings.MAX_FILE_SIZE + MULTIPART_OVERHEAD
+            ):
+                raise _upload_too_large()
+            return await handler(request)
+        
+        return limited_handler
+
+router = APIRouter(route_class=UploadLimitRoute)
+
+async def _read_upload(file: UploadFile) -> bytes:
+    """Copy an uploaded file into memory, rejecting it once it exceeds MAX_FILE_SIZE.
+    
+    The form is already parsed by now; requests announcing an oversized body
+    were turned away by ``UploadLimitRoute``, this catches the ones without
+    a Content-Length.
+    """
+    chunks = []
+    size = 0
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > settings.MAX_FILE_SIZE:
+            raise _upload_too_large()
+        chunks.append(chunk)
+    
+    if not chunks:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Uploaded image is empty"
+        )
+    return b"".join(chunks)
 
 @router.post("/predict-test")
 async def predict_disease_test(request: DiseaseDetectionRequest):
     """Predict disease from plant image (test endpoint without authentication)."""
     try:
-        # Get disease prediction from ML service
-        prediction_result = disease_detection_service.predict_disease(
+        # Get disease prediction from ML service (batched with concurrent requests)
+        prediction_result = await disease_inference_queue.predict(
             request.image_base64
         )
         
-        # Debug logging
-        print(f"Prediction result: {prediction_result}")
-        print(f"Confidence score: {prediction_result['confidence_score']}")
+        return {
+            "disease_name": prediction_result["disease_name"],
+            "confidence_score": prediction_result["confidence_score"],
+            "severity": prediction_result["severity"],
+            "symptoms": prediction_result["symptoms"],
+            "treatment": prediction_result["treatment"],
+            "prevention": prediction_result["prevention"],
+            "issue": prediction_result.get("issue")
+        }
+        
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except (InferenceQueueFull, DiseaseServiceUnavailable) as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error processing disease detection: {str(e)}"
+        )
+
+@router.post("/predict-upload")
+async def predict_disease_upload(file: UploadFile = File(...)):
+    """Predict disease from a multipart image upload (no base64 round trip)."""
+    image_data = await _read_upload(file)
+    
+    try:
+        prediction_result = await disease_inference_queue.predict_bytes(image_data)
         
         return {
             "disease_name": prediction_result["disease_name"],
@@ -36,7 +127,8 @@ async def predict_disease_test(request: DiseaseDetectionRequest):
             "severity": prediction_result["severity"],
             "symptoms": prediction_result["symptoms"],
             "treatment": prediction_result["treatment"],
-            "prevention": prediction_result["prevention"]
+            "prevention": prediction_result["prevention"],
+            "issue": prediction_result.get("issue")
         }
         
     except ValueError as e:
@@ -44,12 +136,118 @@ async def predict_disease_test(request: DiseaseDetectionRequest):
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
+    except (InferenceQueueFull, DiseaseServiceUnavailable) as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error processing disease detection: {str(e)}"
         )
 
+@router.post("/predict-tiled")
+async def predict_disease_tiled(file: UploadFile = File(...)):
+    """Analyse a high-resolution field photo tile by tile and return a disease map."""
+    image_data = await _read_upload(file)
+    
+    try:
+        with disease_inference_queue.admit():
+            return await disease_inference_queue.run_in_executor(
+                disease_detection_service.predict_tiled,
+                image_data
+            )
+    
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except (InferenceQueueFull, DiseaseServiceUnavailable) as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error processing tiled disease detection: {str(e)}"
+        )
+
+@router.post("/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def submit_disease_job(request: Request, response: Response, file: UploadFile = File(...)):
+    """Queue an uploaded image for disease detection and return a job id to poll."""
+    if not settings.DISEASE_ML_ENABLED:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Disease detection is not enabled on this server"
+        )
+    image_data = await _read_upload(file)
+    
+    try:
+        job = await disease_job_queue.submit(image_data)
+    except JobQueueFull as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": "5"}
+        )
+    
+    response.headers["Location"] = str(request.url_for("get_disease_job", job_id=job["job_id"]))
+    return job
+
+@router.get("/jobs/{job_id}")
+async def get_disease_job(job_id: str, response: Response):
+    """Poll a disease detection job; ``result`` holds the prediction once completed."""
+    job = disease_job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found or expired"
+        )
+    if job["status"] in ("queued", "running"):
+        response.headers["Retry-After"] = "2"
+    return job
+
+@router.post("/predict-batch")
+async def predict_disease_batch(request: DiseaseBatchDetectionRequest):
+    """Predict diseases for many images from one plot and return a plot-level summary."""
+    if not request.images_base64:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="At least one image is required"
+        )
+    if len(request.images_base64) > settings.DISEASE_MAX_IMAGES_PER_REQUEST:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.DISEASE_MAX_IMAGES_PER_REQUEST} images are allowed per request"
+        )
+    
+    try:
+        results = await disease_inference_queue.predict_batch(request.images_base64)
+        
+        return {
+            "results": results,
+            "summary": disease_detection_service.summarize_predictions(results)
+        }
+        
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except (InferenceQueueFull, DiseaseServiceUnavailable) as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error processing batch disease detection: {str(e)}"
+        )
+
 
 @router.get("/history", response_model=List[DiseaseDetectionResponse])
 async def get_detection_history(
@@ -159,7 +357,85 @@ async def get_crop_recommendation_history(
 @router.get("/available-crops")
 async def get_available_crops():
     """Get list of crops supported for disease detection."""
+    if settings.DISEASE_ML_ENABLED:
+        await disease_inference_queue.ensure_loaded()
+    
     return {
         "available_crops": ["Plant"],  # Single model supports all plants
         "total_models": 1 if disease_detection_service.model is not None else 0
     }
+
+@router.get("/diagnostics")
+async def get_inference_diagnostics():
+    """Report the inference thread budget, batching statistics and model status."""
+    return {
+        "ml_enabled": settings.DISEASE_ML_ENABLED,
+        "model_loaded": disease_detection_service.is_loaded and disease_detection_service.model is not None,
+        "model_path": disease_detection_service.model_path,
+        "model_version": disease_detection_service.model_version,
+        "inference_backend": settings.DISEASE_INFERENCE_BACKEND,
+        "thread_budget": thread_budget.get_status(),
+        "batching": disease_inference_queue.get_stats(),
+        "batch_buffers": disease_detection_service.batch_buffers.get_stats(),
+        "cascade": disease_detection_service.get_cascade_stats(),
+        "shadow": disease_detection_service.shadow.get_stats(),
+        "jobs": disease_job_queue.get_stats()
+    }
+
+@router.get("/models", dependencies=[Depends(verify_admin_token)])
+async def list_model_versions():
+    """List registered model versions and the hot-swap state of this worker."""
+    active = model_registry.get_active_version()
+    return {
+        "versions": [version._asdict() for version in model_registry.list_versions()],
+        "active_version": active.version if active else None,
+        "serving_version": disease_detection_service.model_version,
+        "swap_status": disease_detection_service.swap_status
+    }
+
+@router.post("/models", status_code=status.HTTP_201_CREATED, dependencies=[Depends(verify_admin_token)])
+async def register_model_version(request: ModelVersionCreate):
+    """Register a .pt file already present in the models directory as a new version."""
+    try:
+        return model_registry.register(request.version, request.filename, request.description)._asdict()
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except OSError as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Could not update the model registry: {str(e)}"
+        )
+
+@router.post("/models/{version}/activate", status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(verify_admin_token)])
+async def activate_model_version(version: str, background_tasks: BackgroundTasks):
+    """Load, warm up and switch to a model version in the background; progress is in ``GET /models``."""
+    if not settings.DISEASE_ML_ENABLED:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Disease detection is not enabled on this server"
+        )
+    if model_registry.get_version(version) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown model version: {version}"
+        )
+    if disease_detection_service.swap_status.get("state") in ("loading", "draining"):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="A model swap is already in progress"
+        )
+    if not model_registry.is_writable():
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Could not update the model registry: manifest is not writable"
+        )
+    
+    background_tasks.add_task(disease_detection_service.activate_version, version)
+    return {
+        "status": "swapping",
+        "version": version,
+        "serving_version": disease_detection_service.model_version
+    }
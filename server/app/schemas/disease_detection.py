@@ -5,6 +5,14 @@ from datetime import datetime
 class DiseaseDetectionRequest(BaseModel):
     image_base64: str
 
+class DiseaseBatchDetectionRequest(BaseModel):
+    images_base64: List[str]
+
+class ModelVersionCreate(BaseModel):
+    version: str
+    filename: str
+    description: str = ""
+
 class DiseaseDetectionResponse(BaseModel):
     id: int
     crop_type: str
@@ -0,0 +1,104 @@
+import logging
+import threading
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    import torch
+
+logger = logging.getLogger(__name__)
+
+MODEL_INPUT_SHAPE = (3, 224, 224)
+
+def pixels_to_batch(pixels: Sequence[np.ndarray], out: np.ndarray) -> np.ndarray:
+    """Write 224x224x3 uint8 images into the leading rows of an Nx3x224x224 float32 array.
+    
+    Channel reordering, float conversion and the 0-255 -> 0-1 scaling run as
+    one vectorized pass per image, with the same result as torchvision's
+    ``ToTensor``. Returns the filled rows.
+    """
+    for row, image in zip(out, pixels):
+        np.divide(image.transpose(2, 0, 1), 255, out=row, dtype=np.float32)
+    return out[:len(pixels)]
+
+class BatchBufferPool:
+    """Preallocated model input batches reused across forward passes.
+    
+    A yielded batch is only valid inside the ``with`` block; callers that keep rows must copy them.
+    """
+    
+    def __init__(self, buffers: int = settings.DISEASE_BATCH_BUFFERS, capacity: Optional[int] = None):
+        self.buffers = max(0, buffers)
+        self.capacity = capacity or max(1, settings.DISEASE_MAX_BATCH_SIZE, settings.DISEASE_BULK_BATCH_SIZE)
+        self._free: List[np.ndarray] = []
+        self._allocated = 0
+        self._lock = threading.Lock()
+        self.stats = {
+            'pooled': 0,
+            'one_off': 0,
+        }
+    
+    def preallocate(self):
+        """Allocate all buffers up front (called during warm-up)"""
+        with self._lock:
+            while self._allocated < self.buffers:
+                self._free.append(self._allocate(self.capacity))
+                self._allocated += 1
+        logger.info(f"Disease input batch buffers ready ({self.buffers} x {self.capacity} images)")
+    
+    @staticmethod
+    def _allocate(rows: int) -> np.ndarray:
+        return np.empty((rows, *MODEL_INPUT_SHAPE), dtype=np.float32)
+    
+    def _acquire(self, rows: int) -> Optional[np.ndarray]:
+        with self._lock:
+            if rows <= self.capacity:
+                if self._free:
+                    self.stats['pooled'] += 1
+                    return self._free.pop()
+                if self._allocated < self.buffers:
+                    self._allocated += 1
+                    self.stats['pooled'] += 1
+                    return self._allocate(self.capacity)
+            self.stats['one_off'] += 1
+            return None
+    
+    def _release(self, buffer: np.ndarray):
+        with self._lock:
+            self._free.append(buffer)
+    
+    @staticmethod
+    def _wrap(array: np.ndarray, as_tensor: bool) -> Union["torch.Tensor", np.ndarray]:
+        if not as_tensor:
+            return array
+        import torch
+        
+        return torch.from_numpy(array)
+    
+    @contextmanager
+    def batch(self, pixels: Sequence[np.ndarray], as_tensor: bool = True) -> Iterator[Union["torch.Tensor", np.ndarray]]:
+        """Yield an Nx3x224x224 float batch holding ``pixels``"""
+        buffer = self._acquire(len(pixels))
+        if buffer is None:
+            yield self._wrap(pixels_to_batch(pixels, self._allocate(len(pixels))), as_tensor)
+            return
+        
+        try:
+            yield self._wrap(pixels_to_batch(pixels, buffer), as_tensor)
+        finally:
+            self._release(buffer)
+    
+    def get_stats(self) -> Dict:
+        """Get buffer reuse statistics"""
+        with self._lock:
+            return {
+                **self.stats,
+                'buffers': self._allocated,
+                'max_buffers': self.buffers,
+                'free': len(self._free),
+                'capacity': self.capacity,
+            }
@@ -0,0 +1,95 @@
+"""
+CPU-optimized inference for the eager PyTorch disease models.
+
+``optimize_for_cpu`` rebuilds a model for the oneDNN CPU kernels:
+
+* the model is traced with ``torch.fx``; ``view`` calls become ``reshape``
+  so flattening works on channels_last activations, and BatchNorm layers
+  directly after a convolution are folded into its weights
+* weights and inputs use the ``channels_last`` (NHWC) memory format,
+  which oneDNN convolutions run without reordering
+* forward passes run under ``torch.inference_mode``
+* in ``frozen`` mode the graph is additionally traced, frozen and passed
+  through ``torch.jit.optimize_for_inference`` (conv/ReLU fusion, prepacked
+  oneDNN weights)
+
+The result is checked against the original model before it is used.
+"""
+import copy
+
+import torch
+import torch.fx
+from torch.fx.experimental.optimization import fuse
+
+CPU_OPTIMIZATION_MODES = ("channels_last", "frozen")
+# Largest |probability delta| accepted between the original and the optimized model
+PARITY_TOLERANCE = 1e-4
+
+class CpuOptimizedModel:
+    """Callable wrapper that feeds channels_last inputs to an optimized graph"""
+    
+    def __init__(self, module, mode: str):
+        self.module = module
+        self.mode = mode
+    
+    def __call__(self, batch: torch.Tensor) -> torch.Tensor:
+        with torch.inference_mode():
+            return self.module(batch.contiguous(memory_format=torch.channels_last))
+    
+    def eval(self):
+        return self
+
+def prepare_graph(model: torch.nn.Module) -> torch.fx.GraphModule:
+    """Trace ``model``, fold conv + BatchNorm and move conv weights to channels_last.
+    
+    ``model`` itself is left untouched: modules with 4-D weights are copied,
+    everything else - notably the large linear layers, which may be
+    memory-mapped and shared between workers - is shared with it.
+    """
+    graph_module = torch.fx.symbolic_trace(model)
+    for node in graph_module.graph.nodes:
+        if node.op == 'call_method' and node.target == 'view':
+            node.target = 'reshape'
+    graph_module.recompile()
+    # The traced module has its own containers, so fusing in place
+    # replaces modules there and not in ``model``
+    graph_module = fuse(graph_module, inplace=True, no_trace=True)
+    
+    modules = dict(graph_module.named_modules())
+    for name, module in modules.items():
+        if any(parameter.dim() == 4 for parameter in module.parameters(recurse=False)):
+            parent_name, _, attribute = name.rpartition('.')
+            converted = copy.deepcopy(module).to(memory_format=torch.channels_last)
+            setattr(modules[parent_name], attribute, converted)
+    return graph_module
+
+def max_probability_delta(reference, candidate, batch_size: int = 2) -> float:
+    """Largest |softmax delta| between two models on a random batch"""
+    batch = torch.rand(batch_size, 3, 224, 224)
+    with torch.no_grad():
+        expected = torch.softmax(reference(batch), dim=1)
+        actual = torch.softmax(candidate(batch), dim=1)
+    return float((expected - actual).abs().max())
+
+def optimize_for_cpu(model: torch.nn.Module, mode: str) -> CpuOptimizedModel:
+    """Build the CPU-optimized counterpart of an eager model.
+    
+    Raises ``ValueError`` for an unknown mode or when the optimized model's
+    outputs drift from the original's.
+    """
+    if mode not in CPU_OPTIMIZATION_MODES:
+        raise ValueError(f"Unknown CPU optimization mode '{mode}'")
+    
+    model.eval()
+    module = prepare_graph(model)
+    if mode == "frozen":
+        example = torch.rand(1, 3, 224, 224).contiguous(memory_format=torch.channels_last)
+        with torch.no_grad():
+            module = torch.jit.freeze(torch.jit.trace(module, example))
+            module = torch.jit.optimize_for_inference(module)
+    
+    optimized = CpuOptimizedModel(module, mode)
+    delta = max_probability_delta(model, optimized)
+    if delta > PARITY_TOLERANCE:
+        raise ValueError(f"CPU-optimized model drifts from the original (max |prob delta| {delta:.2e})")
+    return optimized
@@ -1,221 +1,1107 @@
 import os
 import base64
+import gc
+import json
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
 import numpy as np
 from PIL import Image
 import io
-from typing import Dict, List, Optional
-import torch
-from torchvision import transforms
-import pandas as pd
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Sequence, Set, Tuple, Union
 from app.core.config import settings
+from app.services.batch_buffers import BatchBufferPool, pixels_to_batch
+from app.services.image_quality import QualityReport, assess_image
+from app.services.model_registry import model_registry
+from app.services.onnx_model import OnnxRuntimeModel, softmax
+from app.services.prediction_cache import prediction_cache
+from app.services.shadow_evaluation import ShadowEvaluator
+from app.services.thread_budget import thread_budget
+
+logger = logging.getLogger(__name__)
+if settings.DISEASE_DEBUG_LOGGING:
+    logger.setLevel(logging.DEBUG)
+
+# torch and pandas are imported on first use so that workers
+# which never serve a disease request don't pay for them
+if TYPE_CHECKING:
+    import torch
+
+NUM_CLASSES = 39
+QUANTIZED_MODEL_SUFFIX = '.int8.pth'
+STUDENT_MODEL_SUFFIX = '.student.pth'
+TORCHSCRIPT_MODEL_SUFFIX = '.torchscript'
+ONNX_MODEL_SUFFIX = '.onnx'
+MODEL_INPUT_SIZE = 224
+LOW_CONFIDENCE_SUFFIX = " (Low Confidence - Manual Verification Recommended)"
+BACKGROUND_DISEASE_NAME = "Background Without Leaves"
+
+# (symptom, treatment, description) of the "please reupload" payload per quality issue
+REUPLOAD_MESSAGES = {
+    "no_leaf": (
+        "There is no leaf in the given image",
+        "Please reupload image with leaf",
+        "No plant or leaf detected in the uploaded image. Please upload an image containing a plant leaf for disease analysis."
+    ),
+    "blurry": (
+        "The image is too blurry to analyse",
+        "Please reupload a sharp, focused image of the leaf",
+        "The uploaded image is too blurry for disease analysis. Please hold the camera steady and upload a focused image of the leaf."
+    ),
+    "too_dark": (
+        "The image is too dark to analyse",
+        "Please reupload the leaf image taken in better light",
+        "The uploaded image is too dark for disease analysis. Please upload an image of the leaf taken in daylight."
+    ),
+    "overexposed": (
+        "The image is overexposed",
+        "Please reupload the leaf image without direct glare",
+        "The uploaded image is too bright for disease analysis. Please upload an image of the leaf taken in shade or diffuse light."
+    ),
+}
+
+class DiseaseServiceUnavailable(RuntimeError):
+    """Raised when disease detection is disabled on this worker"""
+
+class ImageRejected(Exception):
+    """Raised by preprocessing when the quality gate rejects an image.
+    
+    ``prediction`` is the "please reupload" payload to return instead of
+    running the model.
+    """
+    
+    def __init__(self, prediction: Dict, report: QualityReport):
+        super().__init__(report.issue)
+        self.prediction = prediction
+        self.report = report
+
+class ModelSwapInProgress(RuntimeError):
+    """Raised when a model swap is requested while another one is running"""
+
+class DiseaseKnowledge(NamedTuple):
+    """Precomputed, immutable prediction payload fields for one class"""
+    disease_name: str
+    symptoms: Tuple[str, ...]
+    treatment: Tuple[str, ...]
+    prevention: Tuple[str, ...]
 
 class DiseaseDetectionService:
     def __init__(self):
         self.model_dir = settings.MODEL_DIR
         self.model = None
+        self.model_path: Optional[str] = None
+        self.model_version: Optional[str] = None
+        # Distilled first-tier model of the cascade (DISEASE_CASCADE_ENABLED)
+        self.student = None
+        self.cascade_stats = {'images': 0, 'escalated': 0, 'student_ms': 0.0, 'full_ms': 0.0}
+        self._cascade_lock = threading.Lock()
         self.disease_info = None
         self.supplement_info = None
-        self.load_model()
-        self.load_data()
+        # Indexed by class; built once in load_data
+        self.knowledge_table: Tuple[DiseaseKnowledge, ...] = ()
+        self.low_confidence_knowledge_table: Tuple[DiseaseKnowledge, ...] = ()
+        # The model and CSVs are loaded lazily by ensure_loaded()
+        self._loaded = False
+        self._load_lock = threading.Lock()
+        self._warmed_up = False
+        # Why the last warm-up attempt failed, reported by /ready
+        self.warm_up_error: Optional[str] = None
+        # Set in a pre-fork master: CPU optimization runs forward passes, so
+        # it is postponed to after_fork for the models listed here
+        self._fork_pending = False
+        self._unoptimized_models: Set[int] = set()
+        # Forward passes pin the model they run on; a hot swap waits on this
+        # condition until nothing pins the old model any more
+        self._model_condition = threading.Condition()
+        self._model_users: Dict[int, int] = {}
+        self._swap_lock = threading.Lock()
+        self.swap_status: Dict = {"state": "idle"}
+        # Candidate model comparison on sampled live traffic (DISEASE_SHADOW_VERSION)
+        self.shadow = ShadowEvaluator(self)
+        # Reusable input tensors filled straight from decoded pixels
+        self.batch_buffers = BatchBufferPool()
+    
+    @property
+    def is_loaded(self) -> bool:
+        return self._loaded
+    
+    @property
+    def is_ready(self) -> bool:
+        """Loaded, warmed up and able to serve predictions."""
+        return self._loaded and self._warmed_up and self.model is not None
+    
+    def ensure_loaded(self):
+        """Load the model and disease data on first use (thread-safe)."""
+        if self._loaded:
+            return
+        if not settings.DISEASE_ML_ENABLED:
+            raise DiseaseServiceUnavailable("Disease detection is not enabled on this server")
+        
+        with self._load_lock:
+            if self._loaded:
+                return
+            thread_budget.apply()
+            self.load_model()
+            self.load_data()
+            self._loaded = True
+    
+    def warm_up(self):
+        """Explicit warm-up hook: load everything and run dummy batches.
+        
+        The first forward passes pay for allocator setup, oneDNN kernel
+        selection and page faults on the weights; doing them here keeps
+        that latency away from the first real requests.
+        """
+        self.ensure_loaded()
+        if self._warmed_up:
+            return
+        if self.model is None:
+            self.warm_up_error = "No model loaded"
+            return
+        
+        try:
+            # Preprocessing path (PIL resize, pixel conversion) and input buffers
+            image = self.resize_for_model(Image.new('RGB', (448, 448), (60, 140, 60)))
+            pixels_to_batch([np.asarray(image)], np.empty((1, 3, 224, 224), dtype=np.float32))
+            self.batch_buffers.preallocate()
+            
+            probabilities = self.warm_up_model(self.model)
+            if self.student is not None:
+                self.warm_up_model(self.student)
+            self.build_prediction(probabilities[0])
+        except Exception as e:
+            self.warm_up_error = str(e)
+            raise
+        
+        self._warmed_up = True
+        self.warm_up_error = None
+        logger.info("Disease detection model warmed up")
+    
+    def warm_up_model(self, model) -> np.ndarray:
+        """Run dummy batches through ``model``; returns the last probabilities."""
+        rng = np.random.default_rng()
+        for batch_size in sorted({1, max(1, settings.DISEASE_MAX_BATCH_SIZE)}):
+            batch = rng.random((batch_size, 3, 224, 224), dtype=np.float32)
+            for _ in range(max(1, settings.DISEASE_WARMUP_ITERATIONS)):
+                probabilities = self.forward(model, batch)
+        return probabilities
+    
+    def get_readiness(self) -> Dict:
+        """Readiness details for the load balancer."""
+        return {
+            "ready": self.is_ready,
+            "model_loaded": self._loaded and self.model is not None,
+            "data_loaded": self.disease_info is not None,
+            "warmed_up": self._warmed_up,
+            "warm_up_error": self.warm_up_error,
+            "model_version": self.model_version,
+        }
+    
+    @contextmanager
+    def use_model(self):
+        """Pin the current model and its cascade student for the duration of the block."""
+        with self._model_condition:
+            model, student = self.model, self.student
+            self._model_users[id(model)] = self._model_users.get(id(model), 0) + 1
+        try:
+            yield model, student
+        finally:
+            with self._model_condition:
+                self._model_users[id(model)] -= 1
+                if not self._model_users[id(model)]:
+                    del self._model_users[id(model)]
+                self._model_condition.notify_all()
+    
+    def swap_model(self, version: str):
+        """Hot-swap to a registered model version without dropping requests.
+        
+        The new model is loaded and warmed up next to the serving one, then
+        swapped in under the model lock. Batches already running finish on
+        the old model, which is released once the last of them is done.
+        """
+        model_version = model_registry.get_version(version)
+        if model_version is None:
+            raise ValueError(f"Unknown model version: {version}")
+        self.ensure_loaded()
+        if not self._swap_lock.acquire(blocking=False):
+            raise ModelSwapInProgress("A model swap is already in progress")
+        
+        try:
+            self._swap_to(model_version)
+        finally:
+            self._swap_lock.release()
+    
+    def _swap_to(self, model_version):
+        """Load, warm up and swap in ``model_version`` (caller holds the swap lock)."""
+        version = model_version.version
+        try:
+            self.swap_status = {"state": "loading", "version": version}
+            logger.info(f"Loading disease model version {version} for hot swap")
+            new_model = self.build_model(model_version.path)
+            self.warm_up_model(new_model)
+            new_student = self.load_student(model_version.path)
+            if new_student is not None:
+                self.warm_up_model(new_student)
+            
+            with self._model_condition:
+                old_model, old_version = self.model, self.model_version
+                self.model = new_model
+                self.student = new_student
+                self.model_path = model_version.path
+                self.model_version = version
+                self.swap_status = {"state": "draining", "version": version}
+                drained = self._model_condition.wait_for(
+                    lambda: id(old_model) not in self._model_users,
+                    timeout=settings.DISEASE_SWAP_DRAIN_TIMEOUT
+                )
+            if not drained:
+                logger.warning(f"Model version {old_version} still in use after drain timeout, releasing it anyway")
+            
+            del old_model
+            gc.collect()
+            self.swap_status = {
+                "state": "idle",
+                "version": version,
+                "previous_version": old_version,
+                "swapped_at": datetime.utcnow().isoformat(),
+            }
+            logger.info(f"Swapped disease model from version {old_version} to {version}")
+        except Exception as e:
+            self.swap_status = {"state": "failed", "version": version, "error": str(e)}
+            raise
+    
+    def activate_version(self, version: str):
+        """Make ``version`` the registry's active version and swap this worker to it.
+        
+        The manifest is written first, so a failed write leaves every worker
+        on the current version; if the swap then fails, the previous active
+        version is restored. Failures are reported in ``swap_status``.
+        """
+        model_version = model_registry.get_version(version)
+        if model_version is None:
+            self.swap_status = {"state": "failed", "version": version, "error": f"Unknown model version: {version}"}
+            return
+        self.ensure_loaded()
+        if not self._swap_lock.acquire(blocking=False):
+            logger.error(f"Not activating disease model version {version}: a model swap is already in progress")
+            return
+        
+        try:
+            previous = model_registry.get_active_version()
+            try:
+                model_registry.set_active(version)
+            except Exception as e:
+                logger.error(f"Activating disease model version {version} failed: {str(e)}")
+                self.swap_status = {
+                    "state": "failed",
+                    "version": version,
+                    "error": f"Could not update the model registry: {str(e)}",
+                }
+                return
+            
+            try:
+                self._swap_to(model_version)
+            except Exception as e:
+                logger.error(f"Activating disease model version {version} failed: {str(e)}")
+                if previous is not None and previous.version != version:
+                    try:
+                        model_registry.set_active(previous.version)
+                    except Exception as restore_error:
+                        logger.error(f"Could not restore active disease model version {previous.version}: {str(restore_error)}")
+        finally:
+            self._swap_lock.release()
+    
+    def sync_with_registry(self):
+        """Follow an active-version change made by another worker."""
+        if not self._loaded or self._swap_lock.locked():
+            return
+        
+        active = model_registry.get_active_version()
+        if active is None or active.version == self.model_version:
+            return
+        if self.swap_status.get("state") == "failed" and self.swap_status.get("version") == active.version:
+            return
+        self.swap_model(active.version)
+    
+    def make_cache_key(self, image_data: bytes) -> str:
+        """Prediction cache key for an image under the serving model version."""
+        return prediction_cache.make_key(image_data, self.model_version)
+    
+    def preprocess_cached(self, image_data: bytes) -> Tuple[str, Optional[Dict], Optional[np.ndarray]]:
+        """Cache key plus either a finished prediction (cached or quality-gate rejection) or the model input pixels."""
+        cache_key = self.make_cache_key(image_data)
+        cached_result = prediction_cache.get(cache_key)
+        if cached_result is not None:
+            return cache_key, cached_result, None
+        try:
+            pixels = self.preprocess_image_pixels(image_data)
+        except ImageRejected as e:
+            # Unusable image: answer without a forward pass
+            prediction_cache.set(cache_key, e.prediction)
+            return cache_key, e.prediction, None
+        return cache_key, None, pixels
+    
+    def preload_for_fork(self):
+        """Load everything in a pre-fork master process so workers share it copy-on-write.
+        
+        Each worker must call ``after_fork`` to apply its thread budget and optimize its models.
+        """
+        thread_budget.defer_until_fork()
+        self._fork_pending = True
+        self.ensure_loaded()
+        gc.collect()
+        gc.freeze()
+    
+    def after_fork(self):
+        """Finish a pre-fork preload in a freshly forked worker."""
+        thread_budget.apply()
+        self._fork_pending = False
+        if self.model is not None and id(self.model) in self._unoptimized_models:
+            self.model = self.optimize_model(self.model)
+        if self.student is not None and id(self.student) in self._unoptimized_models:
+            self.student = self.optimize_model(self.student)
+        self._unoptimized_models.clear()
     
     def load_model(self):
-        """Load the PyTorch disease detection model."""
-        print(f"Loading model from directory: {self.model_dir}")
-        
-        # Look for PyTorch model file
-        model_files = []
-        if os.path.exists(self.model_dir):
-            for file in os.listdir(self.model_dir):
-                if file.endswith('.pt'):
-                    model_files.append(file)
-        
-        if not model_files:
-            print("No PyTorch model files found in the models directory")
+        """Load the active version from the model registry."""
+        logger.info(f"Loading model from directory: {self.model_dir}")
+        
+        model_version = model_registry.get_active_version()
+        if model_version is None:
+            logger.warning("No PyTorch model files found in the models directory")
             return
         
-        # Use the first available model
-        model_file = model_files[0]
-        model_path = os.path.join(self.model_dir, model_file)
-        print(f"Loading model: {model_path}")
+        self.model_path = model_version.path
+        self.model_version = model_version.version
+        logger.info(f"Loading model version {model_version.version}: {model_version.path}")
         
         try:
-            # Import the CNN class
-            import sys
+            self.model = self.build_model(model_version.path)
+        except Exception as e:
+            logger.error(f"Error loading model: {str(e)}")
+            self.model = None
+        
+        if self.model is not None:
+            self.student = self.load_student(model_version.path)
+    
+    def build_model(self, model_path: str):
+        """Load the weights at ``model_path`` with the configured backend.
+        
+        Raises if no usable model could be built.
+        """
+        model_file = os.path.basename(model_path)
+        
+        if settings.DISEASE_INFERENCE_BACKEND == "onnxruntime":
+            onnx_path = self.get_onnx_path(model_path)
+            try:
+                model = OnnxRuntimeModel(
+                    onnx_path,
+                    intra_op_threads=settings.DISEASE_ORT_INTRA_OP_THREADS or thread_budget.intra_op_threads,
+                    inter_op_threads=thread_budget.interop_threads
+                )
+                logger.info(f"Successfully loaded ONNX model: {onnx_path}")
+                return model
+            except Exception as e:
+                logger.error(f"Error loading ONNX model {onnx_path}, falling back to PyTorch: {str(e)}")
+                thread_budget.configure_torch()
+        elif settings.DISEASE_INFERENCE_BACKEND != "torch":
+            logger.warning(f"Unknown inference backend '{settings.DISEASE_INFERENCE_BACKEND}', using PyTorch")
+        
+        # Prefer the frozen TorchScript artifact built by scripts/export_torchscript.py
+        torchscript_path = self.get_torchscript_path(model_path)
+        if settings.DISEASE_USE_TORCHSCRIPT and settings.DISEASE_QUANTIZE and os.path.exists(torchscript_path):
+            logger.warning("DISEASE_QUANTIZE is set, ignoring the TorchScript model")
+        elif settings.DISEASE_USE_TORCHSCRIPT and os.path.exists(torchscript_path):
+            if os.path.getmtime(torchscript_path) >= os.path.getmtime(model_path):
+                try:
+                    model = self.load_torchscript_model(torchscript_path)
+                    logger.info(f"Successfully loaded TorchScript model: {torchscript_path}")
+                    return model
+                except Exception as e:
+                    logger.error(f"Error loading TorchScript model, falling back to {model_file}: {str(e)}")
+            else:
+                logger.warning(f"TorchScript model is older than {model_file}, ignoring it")
+        
+        import torch
+        
+        # Import the CNN class
+        import sys
+        if self.model_dir not in sys.path:
             sys.path.append(self.model_dir)
-            from CNN import CNN
+        from CNN import CNN
+        
+        # Load PyTorch model
+        if settings.DISEASE_QUANTIZE:
+            model = self.load_quantized_model(CNN, model_path)
+        else:
+            model = CNN(NUM_CLASSES)
+            if settings.DISEASE_WEIGHTS_MMAP:
+                # Parameters point straight into the mapped file, so every
+                # worker on the host shares the same page-cache pages
+                state_dict = torch.load(model_path, map_location='cpu', mmap=True)
+                model.load_state_dict(state_dict, assign=True)
+            else:
+                model.load_state_dict(torch.load(model_path, map_location='cpu'))
+            model.eval()
+        logger.info(f"Successfully loaded model: {model_file}")
+        return self.optimize_model(model)
+    
+    def optimize_model(self, model):
+        """Apply ``DISEASE_CPU_OPTIMIZATION`` to an eager model; keeps the model as is if that fails."""
+        mode = settings.DISEASE_CPU_OPTIMIZATION
+        if mode in ("", "off"):
+            return model
+        if self._fork_pending:
+            # Tracing and the parity check run forward passes; not in the master
+            self._unoptimized_models.add(id(model))
+            return model
+        
+        try:
+            from app.services.cpu_optimization import optimize_for_cpu
+            start = time.perf_counter()
+            optimized = optimize_for_cpu(model, mode)
+            logger.info(f"CPU-optimized model ({mode}) in {(time.perf_counter() - start) * 1000:.0f}ms")
+            return optimized
+        except Exception as e:
+            logger.error(f"CPU optimization '{mode}' failed, using the unoptimized model: {str(e)}")
+            return model
+    
+    @staticmethod
+    def get_student_path(model_path: str) -> str:
+        """Path of the distilled cascade model for a ``.pt`` weights file."""
+        return os.path.splitext(model_path)[0] + STUDENT_MODEL_SUFFIX
+    
+    def load_student(self, model_path: str):
+        """Load the cascade's distilled model for ``model_path``, if enabled and present."""
+        if not settings.DISEASE_CASCADE_ENABLED:
+            return None
+        
+        student_path = self.get_student_path(model_path)
+        if not os.path.exists(student_path):
+            logger.warning(f"Cascade enabled but no student model at {student_path}, using the full model only")
+            return None
+        
+        try:
+            import torch
+            from app.services.student_model import StudentCNN
             
-            # Load PyTorch model
-            self.model = CNN(39)  # 39 classes
-            self.model.load_state_dict(torch.load(model_path, map_location='cpu'))
-            self.model.eval()
-            print(f"Successfully loaded model: {model_file}")
+            student = StudentCNN(NUM_CLASSES)
+            student.load_state_dict(torch.load(student_path, map_location='cpu'))
+            student.eval()
+            logger.info(f"Loaded cascade student model: {student_path}")
+            return self.optimize_model(student)
         except Exception as e:
-            print(f"Error loading model: {e}")
-            self.model = None
+            logger.error(f"Error loading student model, using the full model only: {str(e)}")
+            return None
+    
+    @staticmethod
+    def get_torchscript_path(model_path: str) -> str:
+        """Path of the frozen TorchScript artifact for a ``.pt`` weights file."""
+        return os.path.splitext(model_path)[0] + TORCHSCRIPT_MODEL_SUFFIX
+    
+    @staticmethod
+    def get_onnx_path(model_path: str) -> str:
+        """Path of the exported ONNX model for a ``.pt`` weights file."""
+        return os.path.splitext(model_path)[0] + ONNX_MODEL_SUFFIX
+    
+    @staticmethod
+    def load_torchscript_model(torchscript_path: str) -> "torch.jit.ScriptModule":
+        """Load a frozen TorchScript model and fuse it for CPU inference."""
+        import torch
+        
+        model = torch.jit.load(torchscript_path, map_location='cpu')
+        model.eval()
+        try:
+            # Operator fusion has to happen after loading; fused graphs are not serializable
+            model = torch.jit.optimize_for_inference(model)
+        except Exception as e:
+            logger.warning(f"TorchScript inference optimization skipped: {str(e)}")
+        return model
+    
+    @staticmethod
+    def quantize_model(model: "torch.nn.Module") -> "torch.nn.Module":
+        """Apply dynamic int8 quantization to the model's linear layers."""
+        import torch
+        
+        model.eval()
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    
+    def load_quantized_model(self, model_class, model_path: str) -> "torch.nn.Module":
+        """Load the int8 model, reusing the quantized artifact cached next to the weights.
+        
+        When the cache is newer than ``model_path`` the float weights are never
+        loaded; otherwise the model is quantized from them and the cache is
+        (re)written if the models directory is writable.
+        """
+        import torch
+        
+        cache_path = os.path.splitext(model_path)[0] + QUANTIZED_MODEL_SUFFIX
+        
+        if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(model_path):
+            model = self.quantize_model(model_class(NUM_CLASSES))
+            model.load_state_dict(torch.load(cache_path, map_location='cpu'))
+            logger.info(f"Loaded quantized model from cache: {cache_path}")
+            return model
+        
+        float_model = model_class(NUM_CLASSES)
+        float_model.load_state_dict(torch.load(model_path, map_location='cpu'))
+        model = self.quantize_model(float_model)
+        try:
+            torch.save(model.state_dict(), cache_path)
+            logger.info(f"Saved quantized model cache: {cache_path}")
+        except OSError as e:
+            logger.warning(f"Could not cache quantized model: {str(e)}")
+        return model
     
     def load_data(self):
         """Load disease and supplement information from CSV files."""
         try:
+            import pandas as pd
+            
             disease_info_path = os.path.join(self.model_dir, 'disease_info.csv')
             supplement_info_path = os.path.join(self.model_dir, 'supplement_info.csv')
             
             if os.path.exists(disease_info_path):
                 self.disease_info = pd.read_csv(disease_info_path, encoding='cp1252')
-                print(f"Loaded disease info: {len(self.disease_info)} diseases")
+                logger.info(f"Loaded disease info: {len(self.disease_info)} diseases")
             else:
-                print("Disease info CSV not found")
+                logger.warning("Disease info CSV not found")
                 
             if os.path.exists(supplement_info_path):
                 self.supplement_info = pd.read_csv(supplement_info_path, encoding='cp1252')
-                print(f"Loaded supplement info: {len(self.supplement_info)} supplements")
+                logger.info(f"Loaded supplement info: {len(self.supplement_info)} supplements")
             else:
-                print("Supplement info CSV not found")
+                logger.warning("Supplement info CSV not found")
                 
         except Exception as e:
-            print(f"Error loading data files: {e}")
+            logger.error(f"Error loading data files: {str(e)}")
+        
+        self.build_knowledge_tables()
+    
+    def build_knowledge_tables(self):
+        """Precompute symptoms/treatment/prevention for every class index.
+        
+        Low-confidence predictions carry a suffixed disease name that misses
+        the CSV lookup and falls back to the generic recommendations, so they
+        get a table of their own.
+        """
+        num_classes = NUM_CLASSES
+        if self.disease_info is not None:
+            num_classes = max(num_classes, len(self.disease_info))
+        
+        knowledge = []
+        low_confidence_knowledge = []
+        for class_index in range(num_classes):
+            disease_name = str(self.get_disease_name(class_index))
+            knowledge.append(self._compile_knowledge(disease_name))
+            low_confidence_knowledge.append(
+                self._compile_knowledge(f"{disease_name}{LOW_CONFIDENCE_SUFFIX}")
+            )
+        
+        self.knowledge_table = tuple(knowledge)
+        self.low_confidence_knowledge_table = tuple(low_confidence_knowledge)
+    
+    def _compile_knowledge(self, disease_name: str) -> DiseaseKnowledge:
+        return DiseaseKnowledge(
+            disease_name=disease_name,
+            symptoms=tuple(self.get_disease_symptoms(disease_name)),
+            treatment=tuple(self.get_treatment_recommendations(disease_name)),
+            prevention=tuple(self.get_prevention_recommendations(disease_name)),
+        )
+    
+    def get_class_knowledge(self, class_index: int, low_confidence: bool = False) -> DiseaseKnowledge:
+        """O(1) lookup of the precomputed payload fields for a class."""
+        self.ensure_loaded()
+        table = self.low_confidence_knowledge_table if low_confidence else self.knowledge_table
+        if class_index < len(table):
+            return table[class_index]
+        
+        disease_name = str(self.get_disease_name(class_index))
+        if low_confidence:
+            disease_name = f"{disease_name}{LOW_CONFIDENCE_SUFFIX}"
+        return self._compile_knowledge(disease_name)
+    
+    def decode_base64_image(self, image_base64: str) -> bytes:
+        """Decode a base64 payload into raw image file bytes."""
+        # Every 4 base64 characters hold 3 bytes; refuse oversized images before decoding them
+        if len(image_base64) // 4 * 3 > settings.MAX_FILE_SIZE:
+            raise ValueError(f"Image exceeds maximum size of {settings.MAX_FILE_SIZE // (1024 * 1024)}MB")
+        try:
+            return base64.b64decode(image_base64)
+        except Exception as e:
+            raise ValueError(f"Error preprocessing image: {e}")
     
-    def preprocess_image(self, image_base64: str) -> torch.Tensor:
+    def preprocess_image(self, image_base64: str) -> "torch.Tensor":
         """Preprocess image for PyTorch model input."""
+        return self.preprocess_image_bytes(self.decode_base64_image(image_base64))
+    
+    def preprocess_image_bytes(self, image_data: bytes, fast_decode: Optional[bool] = None, quality_gate: Optional[bool] = None) -> "torch.Tensor":
+        """Preprocess raw (already decoded) image file bytes for PyTorch model input."""
+        return self.pixels_to_tensor([self.preprocess_image_pixels(image_data, fast_decode=fast_decode, quality_gate=quality_gate)])
+    
+    def preprocess_image_pixels(self, image_data: bytes, fast_decode: Optional[bool] = None, quality_gate: Optional[bool] = None) -> np.ndarray:
+        """Decode and resize image file bytes to 224x224x3 uint8 pixels.
+        
+        With ``quality_gate`` (default: ``settings.DISEASE_QUALITY_GATE``)
+        blurry, badly exposed and leafless images raise ``ImageRejected``
+        instead of reaching the model.
+        """
+        if quality_gate is None:
+            quality_gate = settings.DISEASE_QUALITY_GATE
+        
+        image = self.resize_for_model(self.decode_image(image_data, fast_decode=fast_decode))
+        if quality_gate:
+            report = assess_image(image)
+            if not report.usable:
+                raise ImageRejected(self.build_reupload_payload(1.0, report.issue), report)
+        return np.asarray(image)
+    
+    def decode_image(self, image_data: bytes, fast_decode: Optional[bool] = None) -> Image.Image:
+        """Decode image file bytes into an RGB PIL image.
+        
+        With ``fast_decode`` (default: ``settings.DISEASE_FAST_DECODE``) JPEGs are
+        decoded at a reduced DCT scale (1/2, 1/4 or 1/8) that still covers
+        224x224, so a 12 MP photo is never decoded at full resolution.
+        """
+        if fast_decode is None:
+            fast_decode = settings.DISEASE_FAST_DECODE
+        
         try:
-            # Decode base64 image
-            image_data = base64.b64decode(image_base64)
             image = Image.open(io.BytesIO(image_data))
             
+            if fast_decode:
+                # No-op for formats other than JPEG
+                image.draft('RGB', (224, 224))
+            
             # Convert to RGB if necessary
             if image.mode != 'RGB':
                 image = image.convert('RGB')
             
-            # Resize to 224x224 (required by the model)
-            image = image.resize((224, 224))
-            
-            # Convert to tensor using torchvision transforms
-            transform = transforms.ToTensor()
-            input_data = transform(image)
-            input_data = input_data.view((-1, 3, 224, 224))
-            
-            return input_data
+            image.load()
+            return image
         except Exception as e:
             raise ValueError(f"Error preprocessing image: {e}")
     
+    def resize_for_model(self, image: Image.Image) -> Image.Image:
+        """Resize to 224x224 (required by the model)."""
+        try:
+            if image.size != (224, 224):
+                image = image.resize((224, 224))
+            return image
+        except Exception as e:
+            raise ValueError(f"Error preprocessing image: {e}")
+    
+    def image_to_tensor(self, image: Image.Image) -> "torch.Tensor":
+        """Resize a decoded RGB image and convert it to a 1x3x224x224 tensor."""
+        image = self.resize_for_model(image)
+        try:
+            return self.pixels_to_tensor([np.asarray(image)])
+        except Exception as e:
+            raise ValueError(f"Error preprocessing image: {e}")
+    
+    @staticmethod
+    def pixels_to_tensor(pixels: Sequence[np.ndarray]) -> "torch.Tensor":
+        """Convert 224x224x3 uint8 images into a new Nx3x224x224 float tensor."""
+        import torch
+        
+        batch = np.empty((len(pixels), 3, 224, 224), dtype=np.float32)
+        return torch.from_numpy(pixels_to_batch(pixels, batch))
+    
     def predict_disease(self, image_base64: str) -> Dict:
         """Predict disease from image."""
+        self.ensure_loaded()
         if self.model is None:
-            print("ERROR: No model available for disease detection")
+            logger.error("No model available for disease detection")
             raise ValueError("No model available for disease detection")
         
         try:
-            print("Starting disease prediction...")
+            # Identical images (e.g. network retries) skip decode and inference
+            image_data = self.decode_base64_image(image_base64)
+            cache_key = self.make_cache_key(image_data)
+            cached_result = prediction_cache.get(cache_key)
+            if cached_result is not None:
+                return cached_result
             
             # Preprocess image
-            processed_image = self.preprocess_image(image_base64)
-            print(f"Image preprocessed, shape: {processed_image.shape}")
+            try:
+                pixels = self.preprocess_image_pixels(image_data)
+            except ImageRejected as e:
+                prediction_cache.set(cache_key, e.prediction)
+                return e.prediction
             
             # Make prediction
-            with torch.no_grad():
-                output = self.model(processed_image)
-                print(f"Model output shape: {output.shape}")
-                print(f"Raw output range: [{output.min().item():.4f}, {output.max().item():.4f}]")
-                
-                # Apply softmax to convert logits to probabilities
-                probabilities = torch.softmax(output, dim=1)
-                probabilities = probabilities.detach().numpy()
-                print(f"Probabilities shape: {probabilities.shape}")
-                print(f"Probabilities sum: {probabilities[0].sum():.6f}")
-            
-            # Get class with highest probability
-            class_index = np.argmax(probabilities[0])
-            confidence = float(probabilities[0][class_index])
-            
-            # Debug information
-            print(f"Raw probabilities shape: {probabilities.shape}")
-            print(f"Top 5 probabilities: {np.sort(probabilities[0])[-5:][::-1]}")
-            print(f"Selected class index: {class_index}")
-            print(f"Confidence for selected class: {confidence:.6f}")
-            
-            # Check for model overfitting indicators
-            probability_std = np.std(probabilities[0])
-            second_highest = np.sort(probabilities[0])[-2]
-            
-            print(f"Probability distribution spread: {probability_std:.6f}")
-            print(f"Second highest probability: {second_highest:.6f}")
-            
-            # Model quality checks
-            is_overfitted = confidence > 0.99 and probability_std < 0.2
-            is_low_confidence = confidence < 0.3
-            is_uniform_distribution = probability_std < 0.1
-            
-            if is_overfitted:
-                print("WARNING: Model appears overfitted - very high confidence with low distribution spread")
-                # Apply more aggressive confidence adjustment
-                confidence = min(confidence, 0.75)
-                print(f"Adjusted confidence due to overfitting: {confidence:.6f}")
-            elif is_low_confidence:
-                print("WARNING: Very low confidence - model uncertain about prediction")
-                # Don't adjust low confidence, it might be legitimate uncertainty
-            elif is_uniform_distribution:
-                print("WARNING: Uniform probability distribution - model may not be working properly")
-                confidence = 0.5  # Set to moderate confidence
-                print(f"Set confidence to moderate due to uniform distribution: {confidence:.6f}")
-            
-            # Ensure confidence is between 0 and 1
-            confidence = min(max(confidence, 0.0), 1.0)
-            
-            print(f"Final confidence: {confidence:.6f}")
-            
-            # Map class index to disease name
-            disease_name = self.get_disease_name(class_index)
-            print(f"Disease name: {disease_name}")
+            probabilities = self.run_inference_pixels([pixels])
+            result = self.build_prediction(probabilities[0])
+            prediction_cache.set(cache_key, result)
+            return result
             
-            # Check if this is a background without leaves (not a disease)
-            if "background without leaves" in disease_name.lower():
-                print("Detected background without leaves - not a disease")
-                return {
-                    "disease_name": "Background Without Leaves",
-                    "confidence_score": confidence,
-                    "severity": "none",
-                    "symptoms": ["There is no leaf in the given image"],
-                    "treatment": ["Please reupload image with leaf"],
-                    "prevention": [
-                        "Use certified disease-free seeds",
-                        "Practice crop rotation", 
-                        "Maintain proper plant spacing",
-                        "Monitor plants regularly"
-                    ],
-                    "description": "No plant or leaf detected in the uploaded image. Please upload an image containing a plant leaf for disease analysis."
-                }
+        except Exception as e:
+            logger.error(f"Error during disease prediction: {str(e)}", exc_info=True)
+            raise ValueError(f"Error during disease prediction: {e}")
+    
+    def run_inference(self, batch: Union["torch.Tensor", np.ndarray]) -> np.ndarray:
+        """Run the model on an Nx3x224x224 batch and return class probabilities."""
+        self.ensure_loaded()
+        with self.use_model() as (model, student):
+            return self.run_pinned(model, student, batch)
+    
+    def run_pinned(self, model, student, batch: Union["torch.Tensor", np.ndarray]) -> np.ndarray:
+        """Same as ``run_inference`` with a model and student pinned by ``use_model``."""
+        if model is None:
+            raise ValueError("No model available for disease detection")
+        start = time.perf_counter()
+        if student is not None:
+            probabilities = self.run_cascade(student, model, batch)
+        else:
+            probabilities = self.forward(model, batch)
+        latency_ms = (time.perf_counter() - start) * 1000
+        
+        self.shadow.observe(batch, probabilities, latency_ms)
+        logger.debug("Disease forward pass: %d image(s)", len(probabilities))
+        return probabilities
+    
+    def run_inference_pixels(self, pixels: Sequence[np.ndarray]) -> np.ndarray:
+        """Run the model on 224x224x3 uint8 images via a reusable input buffer."""
+        with self.batch_buffers.batch(pixels, as_tensor=not isinstance(self.model, OnnxRuntimeModel)) as batch:
+            return self.run_inference(batch)
+    
+    @staticmethod
+    def needs_escalation(probabilities: np.ndarray) -> np.ndarray:
+        """Rows whose top-1 confidence or top-1/top-2 margin is too low to trust."""
+        top_two = np.sort(probabilities, axis=1)[:, -2:]
+        confidence = top_two[:, 1]
+        margin = top_two[:, 1] - top_two[:, 0]
+        return (confidence < settings.DISEASE_CASCADE_MIN_CONFIDENCE) | (margin < settings.DISEASE_CASCADE_MIN_MARGIN)
+    
+    def run_cascade(self, student, model, batch: Union["torch.Tensor", np.ndarray]) -> np.ndarray:
+        """Classify with the student; rerun only its uncertain rows through the full model."""
+        start = time.perf_counter()
+        probabilities = self.forward(student, batch)
+        student_ms = (time.perf_counter() - start) * 1000
+        
+        escalate = self.needs_escalation(probabilities)
+        full_ms = 0.0
+        if escalate.any():
+            rows = np.flatnonzero(escalate)
+            start = time.perf_counter()
+            probabilities[rows] = self.forward(model, batch[rows])
+            full_ms = (time.perf_counter() - start) * 1000
+        
+        with self._cascade_lock:
+            self.cascade_stats['images'] += len(probabilities)
+            self.cascade_stats['escalated'] += int(escalate.sum())
+            self.cascade_stats['student_ms'] += student_ms
+            self.cascade_stats['full_ms'] += full_ms
+        return probabilities
+    
+    def get_cascade_stats(self) -> Dict:
+        """Escalation rate and time spent in each tier of the cascade."""
+        with self._cascade_lock:
+            stats = dict(self.cascade_stats)
+        return {
+            "enabled": self.student is not None,
+            "min_confidence": settings.DISEASE_CASCADE_MIN_CONFIDENCE,
+            "min_margin": settings.DISEASE_CASCADE_MIN_MARGIN,
+            **stats,
+            "escalation_rate": stats['escalated'] / stats['images'] if stats['images'] else None,
+        }
+    
+    @staticmethod
+    def forward(model, batch: Union["torch.Tensor", np.ndarray]) -> np.ndarray:
+        """One forward pass of ``model``, returning softmax probabilities."""
+        if isinstance(model, OnnxRuntimeModel):
+            return softmax(model(batch))
+        import torch
+        
+        if isinstance(batch, np.ndarray):
+            batch = torch.from_numpy(batch)
+        with torch.no_grad():
+            output = model(batch)
             
+            # Apply softmax to convert logits to probabilities
+            probabilities = torch.softmax(output, dim=1)
+            return probabilities.detach().numpy()
+    
+    def build_prediction(self, probabilities: np.ndarray) -> Dict:
+        """Turn one row of class probabilities into the prediction payload."""
+        # Get class with highest probability
+        class_index = int(np.argmax(probabilities))
+        raw_confidence = float(probabilities[class_index])
+        confidence = raw_confidence
+        
+        # Check for model overfitting indicators
+        probability_std = float(np.std(probabilities))
+        
+        # Model quality checks
+        is_overfitted = confidence > 0.99 and probability_std < 0.2
+        is_low_confidence = confidence < 0.3
+        is_uniform_distribution = probability_std < 0.1
+        
+        if is_overfitted:
+            # Apply more aggressive confidence adjustment
+            confidence = min(confidence, 0.75)
+        elif is_low_confidence:
+            # Don't adjust low confidence, it might be legitimate uncertainty
+            pass
+        elif is_uniform_distribution:
+            confidence = 0.5  # Set to moderate confidence
+        
+        # Ensure confidence is between 0 and 1
+        confidence = min(max(confidence, 0.0), 1.0)
+        
+        # Map class index to disease name
+        knowledge = self.get_class_knowledge(class_index)
+        
+        # Check if this is a background without leaves (not a disease)
+        if "background without leaves" in knowledge.disease_name.lower():
+            result = self.build_reupload_payload(confidence)
+        else:
             # Additional validation for suspicious predictions
             if confidence < 0.4:
-                print("WARNING: Low confidence prediction - consider manual verification")
                 # For low confidence, suggest manual verification
-                disease_name = f"{disease_name} (Low Confidence - Manual Verification Recommended)"
-            
-            # Determine severity based on confidence
-            severity = self.determine_severity(confidence)
-            print(f"Severity: {severity}")
-            
-            # Get treatment and prevention recommendations
-            treatment = self.get_treatment_recommendations(disease_name)
-            prevention = self.get_prevention_recommendations(disease_name)
-            symptoms = self.get_disease_symptoms(disease_name)
+                knowledge = self.get_class_knowledge(class_index, low_confidence=True)
             
+            # Treatment, prevention and symptoms are precomputed per class
             result = {
-                "disease_name": disease_name,
+                "disease_name": knowledge.disease_name,
                 "confidence_score": confidence,
-                "severity": severity,
-                "symptoms": symptoms,
-                "treatment": treatment,
-                "prevention": prevention
+                "severity": self.determine_severity(confidence),
+                "symptoms": knowledge.symptoms,
+                "treatment": knowledge.treatment,
+                "prevention": knowledge.prevention
             }
+        
+        if self._should_log_diagnostics():
+            # Sorting and the other statistics are only computed for sampled records
+            top_indices = np.argsort(probabilities)[::-1][:5]
+            self._log_diagnostics({
+                "event": "disease_prediction",
+                "class_index": class_index,
+                "disease_name": result["disease_name"],
+                "raw_confidence": raw_confidence,
+                "confidence": confidence,
+                "severity": result["severity"],
+                "probability_std": probability_std,
+                "second_highest": float(probabilities[top_indices[1]]) if len(top_indices) > 1 else 0.0,
+                "top5": [[int(i), float(probabilities[i])] for i in top_indices],
+                "overfitted": is_overfitted,
+                "low_confidence": is_low_confidence,
+                "uniform_distribution": is_uniform_distribution,
+            })
+        
+        return result
+    
+    @staticmethod
+    def build_reupload_payload(confidence: float, issue: Optional[str] = None) -> Dict:
+        """The "please reupload" payload for leafless or unusable images.
+        
+        ``issue`` is the quality gate's finding; None when the model itself
+        classified the image as background.
+        """
+        symptom, treatment, description = REUPLOAD_MESSAGES[issue or "no_leaf"]
+        return {
+            "disease_name": BACKGROUND_DISEASE_NAME,
+            "confidence_score": confidence,
+            "severity": "none",
+            "symptoms": [symptom],
+            "treatment": [treatment],
+            "prevention": [
+                "Use certified disease-free seeds",
+                "Practice crop rotation", 
+                "Maintain proper plant spacing",
+                "Monitor plants regularly"
+            ],
+            "description": description,
+            "issue": issue
+        }
+    
+    @staticmethod
+    def _should_log_diagnostics() -> bool:
+        """Debug logging is on and this prediction was picked by the sampler."""
+        return logger.isEnabledFor(logging.DEBUG) and random.random() < settings.DISEASE_LOG_SAMPLE_RATE
+    
+    @staticmethod
+    def _log_diagnostics(record: Dict):
+        logger.debug(json.dumps(record))
+    
+    def decode_for_tiling(self, image_data: bytes) -> Tuple[Image.Image, Tuple[int, int]]:
+        """Decode a large image, bounded to ``DISEASE_TILE_MAX_SIDE`` on its long side; also returns its original size."""
+        max_side = max(MODEL_INPUT_SIZE, settings.DISEASE_TILE_MAX_SIDE)
+        try:
+            image = Image.open(io.BytesIO(image_data))
+            original_size = image.size
             
-            print(f"Final result: {result}")
-            return result
+            # JPEGs are decoded straight at a reduced DCT scale close to the target
+            scale = min(1.0, max_side / max(image.size))
+            image.draft('RGB', (int(image.width * scale), int(image.height * scale)))
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+            image.load()
             
+            if max(image.size) > max_side:
+                image.thumbnail((max_side, max_side))
+            if min(image.size) < MODEL_INPUT_SIZE:
+                # Too small for even one tile: upscale the short side to 224,
+                # squeezing the long side of very elongated images back to max_side
+                factor = MODEL_INPUT_SIZE / min(image.size)
+                image = image.resize((
+                    min(max_side, max(MODEL_INPUT_SIZE, round(image.width * factor))),
+                    min(max_side, max(MODEL_INPUT_SIZE, round(image.height * factor))),
+                ))
+            return image, original_size
         except Exception as e:
-            print(f"ERROR during disease prediction: {e}")
-            import traceback
-            traceback.print_exc()
-            raise ValueError(f"Error during disease prediction: {e}")
+            raise ValueError(f"Error preprocessing image: {e}")
+    
+    @staticmethod
+    def tile_starts(length: int, stride: int) -> np.ndarray:
+        """Tile offsets along one axis; the last tile is flush with the edge."""
+        starts = np.arange(0, length - MODEL_INPUT_SIZE + 1, stride)
+        if starts[-1] != length - MODEL_INPUT_SIZE:
+            starts = np.append(starts, length - MODEL_INPUT_SIZE)
+        return starts
+    
+    def tile_image(self, image: Image.Image) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Lay out overlapping 224x224 tiles over an RGB image.
+        
+        Returns a strided view of every window and the y/x offsets of the tile rows and columns.
+        """
+        pixels = np.asarray(image)
+        stride = max(1, round(MODEL_INPUT_SIZE * (1 - min(max(settings.DISEASE_TILE_OVERLAP, 0.0), 0.9))))
+        ys = self.tile_starts(pixels.shape[0], stride)
+        xs = self.tile_starts(pixels.shape[1], stride)
+        
+        # (H-223, W-223, 3, 224, 224) view, no copy
+        windows = np.lib.stride_tricks.sliding_window_view(pixels, (MODEL_INPUT_SIZE, MODEL_INPUT_SIZE), axis=(0, 1))
+        return windows, ys, xs
+    
+    @staticmethod
+    def tile_batch(windows: np.ndarray, ys: np.ndarray, xs: np.ndarray, tile_indices: np.ndarray) -> np.ndarray:
+        """Gather the given row-major tiles into an NCHW float32 batch"""
+        rows, cols = np.divmod(tile_indices, len(xs))
+        # The fancy-index copies just these tiles (uint8, channel-last layout);
+        # the float conversion writes them out NCHW-contiguous, with ToTensor's scaling
+        tiles = windows[ys[rows], xs[cols]]
+        batch = np.empty(tiles.shape, dtype=np.float32)
+        np.divide(tiles, 255, out=batch, dtype=np.float32)
+        return batch
+    
+    def predict_tiled(self, image_data: bytes) -> Dict:
+        """Classify overlapping tiles of a large field image and aggregate them.
+        
+        Returns an image-level verdict (the usual prediction payload), a
+        per-tile disease map in original-image pixel coordinates and a
+        summary of how much of the leaf area each disease covers.
+        """
+        self.ensure_loaded()
+        if self.model is None:
+            raise ValueError("No model available for disease detection")
+        
+        image, original_size = self.decode_for_tiling(image_data)
+        windows, ys, xs = self.tile_image(image)
+        
+        tile_indices = np.arange(len(ys) * len(xs))
+        batch_size = max(1, settings.DISEASE_BULK_BATCH_SIZE)
+        # One model for every tile, even if a hot swap happens meanwhile
+        with self.use_model() as (model, student):
+            probabilities = np.concatenate([
+                self.run_pinned(model, student, self.tile_batch(windows, ys, xs, tile_indices[start:start + batch_size]))
+                for start in range(0, len(tile_indices), batch_size)
+            ])
+        
+        scale_x = original_size[0] / image.width
+        scale_y = original_size[1] / image.height
+        class_indices = probabilities.argmax(axis=1)
+        confidences = probabilities[np.arange(len(probabilities)), class_indices]
+        
+        disease_map = []
+        leaf_tiles = []
+        disease_tiles: Dict[int, List[int]] = {}
+        for tile_index, (class_index, confidence) in enumerate(zip(class_indices, confidences)):
+            row, col = divmod(tile_index, len(xs))
+            disease_name = self.get_class_knowledge(int(class_index)).disease_name
+            is_background = "background without leaves" in disease_name.lower()
+            disease_map.append({
+                "row": row,
+                "col": col,
+                "x": round(xs[col] * scale_x),
+                "y": round(ys[row] * scale_y),
+                "width": round(MODEL_INPUT_SIZE * scale_x),
+                "height": round(MODEL_INPUT_SIZE * scale_y),
+                "disease_name": BACKGROUND_DISEASE_NAME if is_background else disease_name,
+                "confidence_score": float(confidence),
+            })
+            if is_background:
+                continue
+            leaf_tiles.append(tile_index)
+            if "healthy" not in disease_name.lower() and confidence >= settings.DISEASE_TILE_MIN_CONFIDENCE:
+                disease_tiles.setdefault(int(class_index), []).append(tile_index)
+        
+        if not leaf_tiles:
+            verdict = self.build_reupload_payload(float(confidences.mean()))
+        else:
+            if disease_tiles:
+                # The disease with the most confident evidence across tiles
+                verdict_class = max(disease_tiles, key=lambda c: confidences[disease_tiles[c]].sum())
+                supporting = disease_tiles[verdict_class]
+            else:
+                supporting = leaf_tiles
+            verdict = self.build_prediction(probabilities[supporting].mean(axis=0))
+        
+        return {
+            "verdict": verdict,
+            "disease_map": disease_map,
+            "summary": {
+                "image_width": original_size[0],
+                "image_height": original_size[1],
+                "rows": len(ys),
+                "cols": len(xs),
+                "tiles": len(disease_map),
+                "leaf_tiles": len(leaf_tiles),
+                "diseased_tiles": sum(len(tiles) for tiles in disease_tiles.values()),
+                "disease_coverage": {
+                    self.get_class_knowledge(class_index).disease_name: len(tiles) / len(leaf_tiles)
+                    for class_index, tiles in sorted(disease_tiles.items(), key=lambda item: len(item[1]), reverse=True)
+                },
+            },
+        }
+    
+    def summarize_predictions(self, results: List[Dict]) -> Dict:
+        """Aggregate per-image batch results into a plot-level summary."""
+        predictions = [r["prediction"] for r in results if r.get("success")]
+        leaf_predictions = [
+            p for p in predictions if p["disease_name"] != BACKGROUND_DISEASE_NAME
+        ]
+        quality_rejections = sum(1 for p in predictions if p.get("issue") is not None)
+        
+        disease_counts: Dict[str, int] = {}
+        healthy_count = 0
+        for prediction in leaf_predictions:
+            name = prediction["disease_name"].replace(LOW_CONFIDENCE_SUFFIX, "")
+            if "healthy" in name.lower():
+                healthy_count += 1
+            else:
+                disease_counts[name] = disease_counts.get(name, 0) + 1
+        
+        diseased_count = len(leaf_predictions) - healthy_count
+        dominant_disease = max(disease_counts, key=disease_counts.get) if disease_counts else None
+        confidences = [p["confidence_score"] for p in leaf_predictions]
+        
+        return {
+            "total_images": len(results),
+            "analyzed_images": len(predictions),
+            "failed_images": len(results) - len(predictions),
+            "images_without_leaves": len(predictions) - len(leaf_predictions) - quality_rejections,
+            "quality_rejections": quality_rejections,
+            "healthy_images": healthy_count,
+            "diseased_images": diseased_count,
+            "disease_incidence": diseased_count / len(leaf_predictions) if leaf_predictions else 0.0,
+            "disease_counts": dict(sorted(disease_counts.items(), key=lambda item: item[1], reverse=True)),
+            "dominant_disease": dominant_disease,
+            "average_confidence": sum(confidences) / len(confidences) if confidences else 0.0,
+        }
     
     def get_disease_name(self, class_index: int) -> str:
         """Map class index to disease name using CSV data."""
@@ -253,6 +1139,8 @@ class DiseaseDetectionService:
             return self.get_healthy_crop_recommendations(disease_name)
         
         if self.disease_info is not None:
+            import pandas as pd
+            
             # Find the disease in the CSV
             disease_row = self.disease_info[self.disease_info['disease_name'] == disease_name]
             if not disease_row.empty:
@@ -734,6 +1622,8 @@ class DiseaseDetectionService:
             return self.get_healthy_crop_symptoms(disease_name)
         
         if self.disease_info is not None:
+            import pandas as pd
+            
             # Find the disease in the CSV
             disease_row = self.disease_info[self.disease_info['disease_name'] == disease_name]
             if not disease_row.empty:
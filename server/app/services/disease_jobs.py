@@ -0,0 +1,227 @@
+import asyncio
+import copy
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from cachetools import TTLCache
+
+from app.core.config import settings
+from app.services.inference_queue import InferenceBatcher, InferenceQueueFull, disease_inference_queue
+from app.services.thread_budget import detect_worker_count
+
+logger = logging.getLogger(__name__)
+
+class JobQueueFull(RuntimeError):
+    """Raised when too many disease detection jobs are waiting"""
+
+class DiseaseJobQueue:
+    """Submit/poll disease detection jobs, shared across workers through ``job_dir``"""
+    
+    def __init__(
+        self,
+        batcher: InferenceBatcher,
+        max_pending: int = settings.DISEASE_JOB_MAX_PENDING,
+        max_pending_bytes: int = settings.DISEASE_JOB_MAX_PENDING_BYTES,
+        max_jobs: int = settings.DISEASE_JOB_MAX_JOBS,
+        ttl: int = settings.DISEASE_JOB_TTL,
+        concurrency: int = settings.DISEASE_JOB_CONCURRENCY,
+        job_dir: Optional[str] = settings.DISEASE_JOB_DIR or None,
+    ):
+        self.batcher = batcher
+        self.max_pending = max(1, max_pending)
+        self.max_pending_bytes = max(1, max_pending_bytes)
+        self.ttl = ttl
+        self.concurrency = max(1, concurrency)
+        if job_dir is None and detect_worker_count() > 1:
+            # A job is polled at whichever worker the request lands on
+            job_dir = os.path.join(tempfile.gettempdir(), "farming-iq-disease-jobs")
+        self.job_dir = job_dir
+        self.jobs = TTLCache(maxsize=max(1, max_jobs), ttl=ttl)
+        self._lock = threading.Lock()
+        self._queue: Optional[asyncio.Queue] = None
+        # Image bytes of queued and running jobs
+        self._pending_bytes = 0
+        self._workers: List[asyncio.Task] = []
+        
+        if self.job_dir:
+            os.makedirs(self.job_dir, exist_ok=True)
+    
+    async def start(self):
+        """Start the job worker tasks"""
+        if self._workers:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._workers = [asyncio.create_task(self._run()) for _ in range(self.concurrency)]
+        if self.job_dir:
+            self._workers.append(asyncio.create_task(self._purge_periodically()))
+        logger.info(f"Disease job queue started ({self.concurrency} workers, {self.max_pending} pending jobs max)")
+    
+    async def stop(self):
+        """Stop the workers; jobs still queued are marked failed"""
+        for worker in self._workers:
+            worker.cancel()
+        if self._workers:
+            await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        
+        while self._queue is not None and not self._queue.empty():
+            job_id, image_data = self._queue.get_nowait()
+            self._pending_bytes -= len(image_data)
+            self._update(job_id, status="failed", error="Server is shutting down, please resubmit")
+    
+    async def submit(self, image_data: bytes) -> Dict:
+        """Queue an image for classification and return the new job"""
+        await self.start()
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "status": "queued",
+            "created_at": datetime.utcnow().isoformat(),
+            "completed_at": None,
+            "result": None,
+            "error": None,
+        }
+        if self._pending_bytes + len(image_data) > self.max_pending_bytes:
+            raise JobQueueFull("Too many pending disease detection jobs, please retry shortly")
+        try:
+            self._queue.put_nowait((job["job_id"], image_data))
+        except asyncio.QueueFull:
+            raise JobQueueFull("Too many pending disease detection jobs, please retry shortly")
+        self._pending_bytes += len(image_data)
+        
+        self._store(job)
+        return copy.deepcopy(job)
+    
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Current state of a job, or None once it is unknown or expired"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+        if job is None and self.job_dir:
+            job = self._read_disk(job_id)
+        return copy.deepcopy(job) if job is not None else None
+    
+    async def _run(self):
+        """Worker loop: classify queued images through the batcher"""
+        while True:
+            job_id, image_data = await self._queue.get()
+            self._update(job_id, status="running")
+            try:
+                result = await self._predict(image_data)
+                self._update(job_id, status="completed", result=result)
+            except ValueError as e:
+                self._update(job_id, status="failed", error=str(e))
+            except asyncio.CancelledError:
+                self._update(job_id, status="failed", error="Server is shutting down, please resubmit")
+                raise
+            except Exception as e:
+                logger.error(f"Disease detection job {job_id} failed: {str(e)}")
+                self._update(job_id, status="failed", error="Error processing disease detection")
+            finally:
+                self._pending_bytes -= len(image_data)
+    
+    async def _predict(self, image_data: bytes) -> Dict:
+        """Run one image through the batcher, waiting out a full inference queue"""
+        delay = 0.05
+        while True:
+            try:
+                return await self.batcher.predict_bytes(image_data)
+            except InferenceQueueFull:
+                # Jobs absorb spikes: wait for room instead of failing
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 1.0)
+    
+    def _update(self, job_id: str, **changes):
+        with self._lock:
+            job = self.jobs.get(job_id)
+        if job is None:
+            # Evicted while queued or running; recreate the record so the result isn't lost
+            job = {"job_id": job_id, "created_at": None, "completed_at": None, "result": None, "error": None}
+        job = {**job, **changes}
+        if changes.get("status") in ("completed", "failed"):
+            job["completed_at"] = datetime.utcnow().isoformat()
+        self._store(job)
+    
+    def _store(self, job: Dict):
+        with self._lock:
+            self.jobs[job["job_id"]] = job
+        if self.job_dir:
+            self._write_disk(job)
+    
+    def _disk_path(self, job_id: str) -> str:
+        return os.path.join(self.job_dir, f"{job_id}.json")
+    
+    def _read_disk(self, job_id: str) -> Optional[Dict]:
+        # Job ids are uuid4 hex strings; anything else can't name a job file
+        if len(job_id) != 32 or not job_id.isalnum():
+            return None
+        path = self._disk_path(job_id)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable disease job {job_id}: {str(e)}")
+            return None
+    
+    def _write_disk(self, job: Dict):
+        path = self._disk_path(job["job_id"])
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(job, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write disease job {job['job_id']}: {str(e)}")
+    
+    def purge_expired(self) -> int:
+        """Delete job files older than the retention period"""
+        if not self.job_dir or not os.path.isdir(self.job_dir):
+            return 0
+        removed = 0
+        cutoff = time.time() - self.ttl
+        for name in os.listdir(self.job_dir):
+            path = os.path.join(self.job_dir, name)
+            try:
+                if name.endswith('.json') and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    removed += 1
+            except OSError:
+                pass
+        return removed
+    
+    async def _purge_periodically(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(max(60, self.ttl / 4))
+            removed = await loop.run_in_executor(None, self.purge_expired)
+            if removed:
+                logger.info(f"Purged {removed} expired disease jobs")
+    
+    def get_stats(self) -> Dict:
+        """Get job queue statistics"""
+        with self._lock:
+            statuses = [job["status"] for job in self.jobs.values()]
+        return {
+            "pending": self._queue.qsize() if self._queue is not None else 0,
+            "max_pending": self.max_pending,
+            "pending_bytes": self._pending_bytes,
+            "max_pending_bytes": self.max_pending_bytes,
+            "retained_jobs": len(statuses),
+            "running": statuses.count("running"),
+            "completed": statuses.count("completed"),
+            "failed": statuses.count("failed"),
+            "workers": self.concurrency if self._workers else 0,
+        }
+
+# Global job queue instance
+disease_job_queue = DiseaseJobQueue(disease_inference_queue)
@@ -0,0 +1,54 @@
+from typing import NamedTuple, Optional
+
+import numpy as np
+from PIL import Image
+
+from app.core.config import settings
+
+class QualityReport(NamedTuple):
+    """Cheap image statistics used to reject unusable uploads before inference"""
+    sharpness: float  # variance of the Laplacian of the 112x112 luma
+    brightness: float  # mean luma, 0-255
+    leaf_ratio: float  # fraction of green / yellow-green pixels
+    issue: Optional[str]  # "no_leaf", "blurry", "too_dark", "overexposed" or None
+    
+    @property
+    def usable(self) -> bool:
+        return self.issue is None
+
+def assess_image(image: Image.Image) -> QualityReport:
+    """Measure blur, exposure and leaf presence on a 224x224 RGB image.
+    
+    Works on a 112x112 downsample with a handful of vectorized NumPy
+    operations, so it costs a fraction of a millisecond.
+    """
+    # 2x2 box downsample and luma conversion both run in PIL's C code
+    small = image.reduce(2)
+    luma = np.asarray(small.convert('L'), dtype=np.float32)
+    pixels = np.asarray(small, dtype=np.int16)
+    red, green, blue = pixels[..., 0], pixels[..., 1], pixels[..., 2]
+    
+    # 4-neighbour Laplacian; a blurry image has little high-frequency energy
+    laplacian = (
+        4 * luma[1:-1, 1:-1]
+        - luma[:-2, 1:-1] - luma[2:, 1:-1]
+        - luma[1:-1, :-2] - luma[1:-1, 2:]
+    )
+    sharpness = float(laplacian.var())
+    brightness = float(luma.mean())
+    # Green dominates blue and roughly matches or beats red: healthy as well
+    # as yellowing leaves, but not soil, sky or skin
+    leaf_ratio = float(np.mean((green > blue + 10) & (20 * green >= 17 * red)))
+    
+    if brightness < settings.DISEASE_QUALITY_MIN_BRIGHTNESS:
+        issue = "too_dark"
+    elif brightness > settings.DISEASE_QUALITY_MAX_BRIGHTNESS:
+        issue = "overexposed"
+    elif leaf_ratio < settings.DISEASE_QUALITY_MIN_LEAF_RATIO:
+        issue = "no_leaf"
+    elif sharpness < settings.DISEASE_QUALITY_MIN_SHARPNESS:
+        issue = "blurry"
+    else:
+        issue = None
+    
+    return QualityReport(sharpness=sharpness, brightness=brightness, leaf_ratio=leaf_ratio, issue=issue)
@@ -0,0 +1,302 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.disease_detection import DiseaseDetectionService, disease_detection_service
+from app.services.prediction_cache import prediction_cache
+
+logger = logging.getLogger(__name__)
+
+class InferenceQueueFull(RuntimeError):
+    """Raised when the inference queue has no room for another request"""
+
+class InferenceBatcher:
+    """Micro-batching queue in front of the disease detection model.
+    
+    Collects concurrent requests for up to ``window_ms`` into one forward pass on a
+    bounded thread pool; at most ``queue_depth`` requests are admitted at once.
+    """
+    
+    def __init__(
+        self,
+        service: DiseaseDetectionService,
+        max_batch_size: int = settings.DISEASE_MAX_BATCH_SIZE,
+        window_ms: float = settings.DISEASE_BATCH_WINDOW_MS,
+        workers: int = settings.DISEASE_INFERENCE_WORKERS,
+        queue_depth: int = settings.DISEASE_INFERENCE_QUEUE_DEPTH,
+    ):
+        self.service = service
+        self.max_batch_size = max(1, max_batch_size)
+        self.window = max(0.0, window_ms) / 1000.0
+        self.workers = max(1, workers)
+        self.queue_depth = max(1, queue_depth)
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._registry_watcher: Optional[asyncio.Task] = None
+        self._cache_purger: Optional[asyncio.Task] = None
+        self._in_flight: Set[asyncio.Task] = set()
+        # Requests taken off the queue for the batch being collected
+        self._collecting: List[Tuple[np.ndarray, asyncio.Future]] = []
+        # Requests admitted by predict/predict_bytes and not finished yet
+        self._admitted = 0
+        self.stats = {
+            'batches': 0,
+            'images': 0,
+            'largest_batch': 0,
+            'rejected': 0,
+        }
+    
+    async def start(self):
+        """Start the background batching loop"""
+        if self._worker is not None and not self._worker.done():
+            return
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix="disease-inference"
+            )
+        self._queue = asyncio.Queue(maxsize=self.queue_depth)
+        self._worker = asyncio.create_task(self._run())
+        if settings.DISEASE_REGISTRY_POLL_SECONDS > 0:
+            self._registry_watcher = asyncio.create_task(self._watch_registry())
+        if prediction_cache.enabled and prediction_cache.disk_dir:
+            self._cache_purger = asyncio.create_task(self._purge_cache_periodically())
+        logger.info(
+            f"Disease inference batcher started (max batch {self.max_batch_size}, "
+            f"window {self.window * 1000:.1f}ms, {self.workers} workers, "
+            f"queue depth {self.queue_depth})"
+        )
+    
+    async def stop(self):
+        """Stop the batching loop, finish running batches and fail any requests still waiting"""
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        if self._registry_watcher is not None:
+            self._registry_watcher.cancel()
+            self._registry_watcher = None
+        if self._cache_purger is not None:
+            self._cache_purger.cancel()
+            self._cache_purger = None
+        
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+        
+        waiting = self._collecting
+        self._collecting = []
+        while self._queue is not None and not self._queue.empty():
+            waiting.append(self._queue.get_nowait())
+        for _, future in waiting:
+            if not future.done():
+                future.set_exception(RuntimeError("Inference queue is shutting down"))
+        
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+        logger.info("Disease inference batcher stopped")
+    
+    async def ensure_loaded(self):
+        """Load the model on the thread pool (no-op once loaded)"""
+        if not self.service.is_loaded:
+            await self.run_in_executor(self.service.ensure_loaded)
+    
+    async def warm_up(self):
+        """Load the model and run warm-up batches on the thread pool, retrying with backoff until they succeed"""
+        delay = 1.0
+        while True:
+            try:
+                await self.run_in_executor(self.service.warm_up)
+                return
+            except Exception as e:
+                logger.error(f"Disease model warm-up failed, retrying in {delay:.0f}s: {str(e)}")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60.0)
+    
+    async def swap_model(self, version: str):
+        """Hot-swap the model version.
+        
+        Loading and warming run on the event loop's default executor, not
+        the inference pool, so batches keep flowing during the swap.
+        """
+        await asyncio.get_running_loop().run_in_executor(None, self.service.swap_model, version)
+    
+    async def _watch_registry(self):
+        """Pick up active-version changes made through another worker"""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(settings.DISEASE_REGISTRY_POLL_SECONDS)
+            try:
+                await loop.run_in_executor(None, self.service.sync_with_registry)
+            except Exception as e:
+                logger.error(f"Error syncing disease model with the registry: {str(e)}")
+    
+    async def _purge_cache_periodically(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(max(60, prediction_cache.ttl / 4))
+            removed = await loop.run_in_executor(None, prediction_cache.purge_expired)
+            if removed:
+                logger.info(f"Purged {removed} prediction cache files")
+    
+    async def run_in_executor(self, func, *args):
+        """Run a blocking call on the inference thread pool"""
+        await self.start()
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+    
+    @contextmanager
+    def admit(self, slots: int = 1):
+        """Hold ``slots`` of the ``queue_depth`` pipeline slots, or reject the request"""
+        if self._admitted + slots > self.queue_depth:
+            self.stats['rejected'] += 1
+            raise InferenceQueueFull("Disease detection is busy, please retry shortly")
+        self._admitted += slots
+        try:
+            yield
+        finally:
+            self._admitted -= slots
+    
+    async def predict(self, image_base64: str) -> Dict:
+        """Decode a base64 image, queue it for batched inference and build the prediction payload."""
+        with self.admit():
+            return await self._predict_base64(image_base64)
+    
+    async def predict_bytes(self, image_data: bytes) -> Dict:
+        """Same as ``predict`` for raw image file bytes (multipart uploads)."""
+        with self.admit():
+            return await self._predict_bytes(image_data)
+    
+    async def predict_batch(self, images_base64: List[str]) -> List[Dict]:
+        """Predict many base64 images in order, keeping at most ``max_batch_size`` of them in the pipeline."""
+        await self.ensure_loaded()
+        if self.service.model is None:
+            raise ValueError("No model available for disease detection")
+        
+        slots = min(len(images_base64), self.max_batch_size, self.queue_depth)
+        with self.admit(slots):
+            window = asyncio.Semaphore(slots)
+            return await asyncio.gather(*[
+                self._predict_batch_image(index, image_base64, window)
+                for index, image_base64 in enumerate(images_base64)
+            ])
+    
+    async def _predict_batch_image(self, index: int, image_base64: str, window: asyncio.Semaphore) -> Dict:
+        async with window:
+            try:
+                prediction = await self._predict_base64(image_base64)
+            except ValueError as e:
+                return {"index": index, "success": False, "error": str(e)}
+        return {"index": index, "success": True, "prediction": prediction}
+    
+    async def _predict_base64(self, image_base64: str) -> Dict:
+        image_data = await self.run_in_executor(self.service.decode_base64_image, image_base64)
+        return await self._predict_bytes(image_data)
+    
+    async def _predict_bytes(self, image_data: bytes) -> Dict:
+        await self.ensure_loaded()
+        if self.service.model is None:
+            raise ValueError("No model available for disease detection")
+        
+        # Hashing the upload and the cache lookup stay off the event loop
+        cache_key, prediction, pixels = await self.run_in_executor(self.service.preprocess_cached, image_data)
+        if prediction is not None:
+            return prediction
+        probabilities = await self.submit(pixels)
+        result = self.service.build_prediction(probabilities)
+        # The store may write to disk; the default executor keeps it off the loop and the inference threads
+        await asyncio.get_running_loop().run_in_executor(None, prediction_cache.set, cache_key, result)
+        return result
+    
+    async def submit(self, pixels: np.ndarray) -> np.ndarray:
+        """Queue preprocessed 224x224x3 uint8 pixels and wait for their class probabilities."""
+        await self.start()
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((pixels, future))
+        except asyncio.QueueFull:
+            self.stats['rejected'] += 1
+            raise InferenceQueueFull("Disease detection is busy, please retry shortly")
+        return await future
+    
+    async def _run(self):
+        """Collect queued requests into batches and hand them to the thread pool"""
+        loop = asyncio.get_running_loop()
+        free_workers = asyncio.Semaphore(self.workers)
+        while True:
+            # Wait for a free worker first so requests keep accumulating
+            # into the next batch while every worker is busy
+            await free_workers.acquire()
+            batch = self._collecting = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            
+            while len(batch) < self.max_batch_size:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            
+            self._collecting = []
+            task = asyncio.create_task(self._dispatch(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+            task.add_done_callback(lambda _: free_workers.release())
+    
+    def _forward(self, pixels: List[np.ndarray]) -> np.ndarray:
+        """Fill a batch buffer and run one forward pass (executed on the thread pool)"""
+        return self.service.run_inference_pixels(pixels)
+    
+    async def _dispatch(self, batch: List[Tuple[np.ndarray, asyncio.Future]]):
+        """Run one forward pass for the batch and fan the results back out"""
+        pending = [(pixels, future) for pixels, future in batch if not future.done()]
+        if not pending:
+            return
+        
+        try:
+            probabilities = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self._forward, [pixels for pixels, _ in pending]
+            )
+        except Exception as e:
+            logger.error(f"Batched disease inference failed: {str(e)}")
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        
+        self.stats['batches'] += 1
+        self.stats['images'] += len(pending)
+        self.stats['largest_batch'] = max(self.stats['largest_batch'], len(pending))
+        
+        for row, (_, future) in zip(probabilities, pending):
+            if not future.done():
+                future.set_result(row)
+    
+    def get_stats(self) -> Dict:
+        """Get batching statistics"""
+        batches = self.stats['batches']
+        return {
+            **self.stats,
+            'average_batch_size': self.stats['images'] / batches if batches else 0,
+            'queued': self._queue.qsize() if self._queue is not None else 0,
+            'admitted': self._admitted,
+            'in_flight_batches': len(self._in_flight),
+            'workers': self.workers,
+        }
+
+# Global batcher instance
+disease_inference_queue = InferenceBatcher(disease_detection_service)
@@ -0,0 +1,130 @@
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_FILENAME = 'model_registry.json'
+
+class ModelVersion(NamedTuple):
+    """One registered set of disease model weights"""
+    version: str
+    path: str
+    description: str = ""
+    registered_at: Optional[str] = None
+
+class ModelRegistry:
+    """Versioned disease models under ``settings.MODEL_DIR``, listed in ``model_registry.json``.
+    
+    Without a manifest every ``.pt`` file in the directory is a version named after its stem.
+    """
+    
+    def __init__(self, model_dir: str = settings.MODEL_DIR, manifest_path: Optional[str] = settings.DISEASE_REGISTRY_FILE or None):
+        self.model_dir = model_dir
+        self.manifest_path = manifest_path or os.path.join(model_dir, REGISTRY_FILENAME)
+        self._lock = threading.Lock()
+    
+    def _read_manifest(self) -> Dict:
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return self._discover_manifest()
+        except (OSError, ValueError) as e:
+            logger.error(f"Unreadable model registry {self.manifest_path}, scanning for .pt files: {str(e)}")
+            return self._discover_manifest()
+        
+        manifest.setdefault('versions', {})
+        manifest.setdefault('active', None)
+        return manifest
+    
+    def _discover_manifest(self) -> Dict:
+        """Build a manifest from the ``.pt`` files in the models directory"""
+        versions = {}
+        if os.path.isdir(self.model_dir):
+            for file in sorted(os.listdir(self.model_dir)):
+                if file.endswith('.pt'):
+                    versions[os.path.splitext(file)[0]] = {'path': file}
+        return {
+            'active': next(iter(versions), None),
+            'versions': versions,
+        }
+    
+    def _write_manifest(self, manifest: Dict):
+        tmp_path = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+    
+    def is_writable(self) -> bool:
+        """Whether the manifest can be (re)written, e.g. to activate a version"""
+        directory = os.path.dirname(os.path.abspath(self.manifest_path))
+        if not os.access(directory, os.W_OK):
+            return False
+        return not os.path.exists(self.manifest_path) or os.access(self.manifest_path, os.W_OK)
+    
+    def _to_version(self, version: str, entry: Dict) -> ModelVersion:
+        return ModelVersion(
+            version=version,
+            path=os.path.join(self.model_dir, entry['path']),
+            description=entry.get('description', ""),
+            registered_at=entry.get('registered_at'),
+        )
+    
+    def list_versions(self) -> List[ModelVersion]:
+        """All registered versions"""
+        manifest = self._read_manifest()
+        return [self._to_version(version, entry) for version, entry in manifest['versions'].items()]
+    
+    def get_version(self, version: str) -> Optional[ModelVersion]:
+        """Look up one registered version"""
+        entry = self._read_manifest()['versions'].get(version)
+        return self._to_version(version, entry) if entry else None
+    
+    def get_active_version(self) -> Optional[ModelVersion]:
+        """The version workers should be serving, if any"""
+        manifest = self._read_manifest()
+        active = manifest['active']
+        if active is None or active not in manifest['versions']:
+            return None
+        return self._to_version(active, manifest['versions'][active])
+    
+    def register(self, version: str, filename: str, description: str = "") -> ModelVersion:
+        """Register a weights file that already sits in the models directory"""
+        if os.path.basename(filename) != filename or not filename.endswith('.pt'):
+            raise ValueError("Model file must be a .pt file name inside the models directory")
+        if not os.path.isfile(os.path.join(self.model_dir, filename)):
+            raise ValueError(f"Model file not found: {filename}")
+        
+        with self._lock:
+            manifest = self._read_manifest()
+            if version in manifest['versions']:
+                raise ValueError(f"Model version already registered: {version}")
+            manifest['versions'][version] = {
+                'path': filename,
+                'description': description,
+                'registered_at': datetime.utcnow().isoformat(),
+            }
+            self._write_manifest(manifest)
+        
+        logger.info(f"Registered disease model version {version}: {filename}")
+        return self.get_version(version)
+    
+    def set_active(self, version: str):
+        """Record ``version`` as the one every worker should serve"""
+        with self._lock:
+            manifest = self._read_manifest()
+            if version not in manifest['versions']:
+                raise ValueError(f"Unknown model version: {version}")
+            manifest['active'] = version
+            self._write_manifest(manifest)
+        
+        logger.info(f"Active disease model version set to {version}")
+
+# Global registry instance
+model_registry = ModelRegistry()
@@ -0,0 +1,46 @@
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def softmax(logits: np.ndarray) -> np.ndarray:
+    """Row-wise softmax of an NxC logits array"""
+    exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return exp / exp.sum(axis=1, keepdims=True)
+
+class OnnxRuntimeModel:
+    """Callable wrapper that runs an exported ONNX disease model with ONNX Runtime.
+    
+    Takes an Nx3x224x224 float32 array and returns an Nx39 array of logits,
+    so serving with this backend never imports torch. ``onnxruntime`` is
+    imported lazily so it stays an optional dependency.
+    """
+    
+    def __init__(self, model_path: str, intra_op_threads: int = 0, inter_op_threads: int = 0):
+        import onnxruntime as ort
+        
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        if intra_op_threads > 0:
+            options.intra_op_num_threads = intra_op_threads
+        if inter_op_threads > 0:
+            options.inter_op_num_threads = inter_op_threads
+        
+        self.model_path = model_path
+        self.session = ort.InferenceSession(
+            model_path,
+            sess_options=options,
+            providers=['CPUExecutionProvider']
+        )
+        self.input_name = self.session.get_inputs()[0].name
+        logger.info(f"ONNX Runtime session created for {model_path}")
+    
+    def __call__(self, batch: np.ndarray) -> np.ndarray:
+        # CPU torch tensors (parity scripts) convert without a copy
+        inputs = np.ascontiguousarray(batch, dtype=np.float32)
+        return self.session.run(None, {self.input_name: inputs})[0]
+    
+    def eval(self):
+        return self
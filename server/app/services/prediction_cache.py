@@ -0,0 +1,156 @@
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from cachetools import TTLCache
+
+from app.core.config import settings
+from app.utils.performance import perf_monitor
+
+logger = logging.getLogger(__name__)
+
+class PredictionCache:
+    """Content-addressed cache of disease predictions (in-memory LRU, optionally backed by ``disk_dir``)"""
+    
+    def __init__(
+        self,
+        maxsize: int = settings.DISEASE_CACHE_SIZE,
+        ttl: int = settings.DISEASE_CACHE_TTL,
+        disk_dir: Optional[str] = settings.DISEASE_CACHE_DIR or None,
+        enabled: bool = settings.DISEASE_CACHE_ENABLED,
+        max_disk_files: int = settings.DISEASE_CACHE_DIR_MAX_FILES,
+    ):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self.max_disk_files = max(1, max_disk_files)
+        self.memory = TTLCache(maxsize=max(1, maxsize), ttl=ttl)
+        self._lock = threading.Lock()
+        
+        if self.enabled and self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+    
+    @staticmethod
+    def make_key(image_data: bytes, model_version: Optional[str] = None) -> str:
+        """Hash raw image bytes into a cache key.
+        
+        Including the model version means a hot-swapped model never serves
+        predictions cached from its predecessor.
+        """
+        digest = hashlib.sha256()
+        if model_version:
+            digest.update(model_version.encode('utf-8'))
+            digest.update(b'\0')
+        digest.update(image_data)
+        return digest.hexdigest()
+    
+    def get(self, key: str) -> Optional[Dict]:
+        """Look up a prediction, recording the hit or miss"""
+        if not self.enabled:
+            return None
+        
+        with self._lock:
+            result = self.memory.get(key)
+        
+        if result is None and self.disk_dir:
+            result = self._read_disk(key)
+            if result is not None:
+                with self._lock:
+                    self.memory[key] = result
+        
+        if result is None:
+            perf_monitor.record_cache_miss()
+            return None
+        
+        perf_monitor.record_cache_hit()
+        return copy.deepcopy(result)
+    
+    def set(self, key: str, result: Dict):
+        """Store a prediction"""
+        if not self.enabled:
+            return
+        
+        result = copy.deepcopy(result)
+        with self._lock:
+            self.memory[key] = result
+        
+        if self.disk_dir:
+            self._write_disk(key, result)
+    
+    def clear(self):
+        """Drop every cached prediction (e.g. after the model changes)"""
+        with self._lock:
+            self.memory.clear()
+        
+        if self.disk_dir and os.path.isdir(self.disk_dir):
+            for name in os.listdir(self.disk_dir):
+                if name.endswith('.json'):
+                    try:
+                        os.remove(os.path.join(self.disk_dir, name))
+                    except OSError:
+                        pass
+    
+    def purge_expired(self) -> int:
+        """Delete cache files older than the TTL, then the oldest ones beyond ``max_disk_files``"""
+        if not self.disk_dir or not os.path.isdir(self.disk_dir):
+            return 0
+        removed = 0
+        cutoff = time.time() - self.ttl
+        entries = []
+        for name in os.listdir(self.disk_dir):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.disk_dir, name)
+            try:
+                mtime = os.path.getmtime(path)
+                if mtime < cutoff:
+                    os.remove(path)
+                    removed += 1
+                else:
+                    entries.append((mtime, path))
+            except OSError:
+                pass
+        
+        entries.sort()
+        for _, path in entries[:max(0, len(entries) - self.max_disk_files)]:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        return removed
+    
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json")
+    
+    def _read_disk(self, key: str) -> Optional[Dict]:
+        path = self._disk_path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable prediction cache entry {key}: {str(e)}")
+            return None
+    
+    def _write_disk(self, key: str, result: Dict):
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(result, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write prediction cache entry {key}: {str(e)}")
+
+# Global prediction cache instance
+prediction_cache = PredictionCache()
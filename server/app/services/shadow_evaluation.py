@@ -0,0 +1,234 @@
+import bisect
+import json
+import logging
+import queue
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, Optional, Union
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.model_registry import model_registry
+
+if TYPE_CHECKING:
+    import torch
+    from app.services.disease_detection import DiseaseDetectionService
+
+logger = logging.getLogger(__name__)
+
+# Confidence deltas kept for the percentile summary
+MAX_CONFIDENCE_DELTAS = 10000
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram"""
+    
+    def __init__(self, buckets_ms=LATENCY_BUCKETS_MS):
+        self.buckets_ms = tuple(buckets_ms)
+        self.counts = [0] * (len(self.buckets_ms) + 1)
+        self.total_ms = 0.0
+    
+    def record(self, latency_ms: float):
+        self.counts[bisect.bisect_left(self.buckets_ms, latency_ms)] += 1
+        self.total_ms += latency_ms
+    
+    def to_dict(self) -> Dict:
+        count = sum(self.counts)
+        labels = [f"<={bound}ms" for bound in self.buckets_ms] + [f">{self.buckets_ms[-1]}ms"]
+        return {
+            "count": count,
+            "mean_ms": self.total_ms / count if count else 0.0,
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+class ShadowEvaluator:
+    """Compare a candidate model against production on sampled live traffic (off the request path)"""
+    
+    def __init__(
+        self,
+        service: "DiseaseDetectionService",
+        version: str = settings.DISEASE_SHADOW_VERSION,
+        sample_rate: float = settings.DISEASE_SHADOW_SAMPLE_RATE,
+        queue_size: int = settings.DISEASE_SHADOW_QUEUE_SIZE,
+        log_file: str = settings.DISEASE_SHADOW_LOG_FILE,
+    ):
+        self.service = service
+        self.version = version
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        self.log_file = log_file
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, queue_size))
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._stats_lock = threading.Lock()
+        self.candidate = None
+        self.error: Optional[str] = None
+        self.reset_stats()
+    
+    @property
+    def enabled(self) -> bool:
+        return bool(self.version) and self.sample_rate > 0 and self.error is None
+    
+    def reset_stats(self):
+        """Clear the collected comparison metrics"""
+        with self._stats_lock:
+            self.stats = {
+                'sampled': 0,
+                'dropped': 0,
+                'evaluated': 0,
+                'agreements': 0,
+                'failed': 0,
+            }
+            self.confidence_deltas = deque(maxlen=MAX_CONFIDENCE_DELTAS)
+            self.disagreements: Dict[str, int] = {}
+            self.production_latency = LatencyHistogram()
+            self.candidate_latency = LatencyHistogram()
+    
+    def observe(self, batch: Union["torch.Tensor", np.ndarray], probabilities: np.ndarray, latency_ms: float):
+        """Sample rows of a served batch for shadow evaluation (request path, non-blocking)"""
+        if not self.enabled:
+            return
+        
+        for row_index in range(len(probabilities)):
+            if random.random() >= self.sample_rate:
+                continue
+            self._ensure_started()
+            sample = (
+                # Copy the row: the batch buffer may be reused by the caller
+                np.array(batch[row_index:row_index + 1]),
+                probabilities[row_index],
+                latency_ms,
+                self.service.model_version,
+            )
+            try:
+                self._queue.put_nowait(sample)
+                with self._stats_lock:
+                    self.stats['sampled'] += 1
+            except queue.Full:
+                with self._stats_lock:
+                    self.stats['dropped'] += 1
+    
+    def stop(self):
+        """Stop the shadow thread once the queued samples are processed"""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join(timeout=10)
+        self._thread = None
+    
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="disease-shadow", daemon=True)
+                self._thread.start()
+    
+    def _load_candidate(self) -> bool:
+        model_version = model_registry.get_version(self.version)
+        try:
+            if model_version is None:
+                raise ValueError(f"Unknown model version: {self.version}")
+            self.candidate = self.service.build_model(model_version.path)
+            logger.info(f"Shadow evaluation of model version {self.version} started")
+            return True
+        except Exception as e:
+            # Disables observe(); production serving is unaffected
+            self.error = str(e)
+            logger.error(f"Could not load shadow model {self.version}, shadow mode disabled: {str(e)}")
+            return False
+    
+    def _run(self):
+        if not self._load_candidate():
+            return
+        
+        while True:
+            try:
+                sample = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                if self._stop_event.is_set():
+                    break
+                continue
+            try:
+                self._evaluate(*sample)
+            except Exception as e:
+                with self._stats_lock:
+                    self.stats['failed'] += 1
+                logger.error(f"Shadow evaluation failed: {str(e)}")
+    
+    def _evaluate(self, batch: np.ndarray, production: np.ndarray, production_ms: float, production_version: Optional[str]):
+        start = time.perf_counter()
+        candidate = self.service.forward(self.candidate, batch)[0]
+        candidate_ms = (time.perf_counter() - start) * 1000
+        
+        production_class = int(np.argmax(production))
+        candidate_class = int(np.argmax(candidate))
+        production_confidence = float(production[production_class])
+        candidate_confidence = float(candidate[candidate_class])
+        agree = production_class == candidate_class
+        
+        with self._stats_lock:
+            self.stats['evaluated'] += 1
+            if agree:
+                self.stats['agreements'] += 1
+            else:
+                pair = f"{production_class}->{candidate_class}"
+                self.disagreements[pair] = self.disagreements.get(pair, 0) + 1
+            self.confidence_deltas.append(candidate_confidence - production_confidence)
+            self.production_latency.record(production_ms)
+            self.candidate_latency.record(candidate_ms)
+        
+        if self.log_file:
+            self._write_record({
+                "timestamp": datetime.utcnow().isoformat(),
+                "production_version": production_version,
+                "candidate_version": self.version,
+                "production_class": production_class,
+                "candidate_class": candidate_class,
+                "production_confidence": production_confidence,
+                "candidate_confidence": candidate_confidence,
+                # Candidate probability of the production class, for calibration review
+                "candidate_confidence_on_production_class": float(candidate[production_class]),
+                "production_latency_ms": production_ms,
+                "candidate_latency_ms": candidate_ms,
+            })
+    
+    def _write_record(self, record: Dict):
+        try:
+            with open(self.log_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record) + '\n')
+        except OSError as e:
+            logger.warning(f"Could not write shadow evaluation record: {str(e)}")
+    
+    def get_stats(self) -> Dict:
+        """Comparison metrics collected so far (this worker only)"""
+        with self._stats_lock:
+            evaluated = self.stats['evaluated']
+            deltas = np.asarray(self.confidence_deltas, dtype=np.float64)
+            top_disagreements = sorted(self.disagreements.items(), key=lambda item: item[1], reverse=True)[:10]
+            return {
+                "enabled": self.enabled,
+                "candidate_version": self.version or None,
+                "sample_rate": self.sample_rate,
+                "error": self.error,
+                **self.stats,
+                "queued": self._queue.qsize(),
+                "agreement_rate": self.stats['agreements'] / evaluated if evaluated else None,
+                "confidence_delta": {
+                    "mean": float(deltas.mean()) if evaluated else None,
+                    "mean_abs": float(np.abs(deltas).mean()) if evaluated else None,
+                    "p5": float(np.percentile(deltas, 5)) if evaluated else None,
+                    "p95": float(np.percentile(deltas, 95)) if evaluated else None,
+                },
+                "top_disagreements": dict(top_disagreements),
+                "latency": {
+                    "production": self.production_latency.to_dict(),
+                    "candidate": self.candidate_latency.to_dict(),
+                },
+            }
@@ -0,0 +1,49 @@
+"""
+Small distilled disease classifier used as the first tier of the cascade.
+
+A MobileNet-style stack of depthwise separable convolutions (~0.2M
+parameters) that takes the same 3x224x224 input as the full ``CNN`` and
+predicts the same classes. It is trained from the full model with
+``scripts/distill_student.py``.
+"""
+import torch
+from torch import nn
+
+def conv_bn(in_channels: int, out_channels: int, stride: int) -> nn.Sequential:
+    return nn.Sequential(
+        nn.Conv2d(in_channels, out_channels, 3, stride, 1, bias=False),
+        nn.BatchNorm2d(out_channels),
+        nn.ReLU(inplace=True),
+    )
+
+def depthwise_separable(in_channels: int, out_channels: int, stride: int) -> nn.Sequential:
+    return nn.Sequential(
+        nn.Conv2d(in_channels, in_channels, 3, stride, 1, groups=in_channels, bias=False),
+        nn.BatchNorm2d(in_channels),
+        nn.ReLU(inplace=True),
+        nn.Conv2d(in_channels, out_channels, 1, bias=False),
+        nn.BatchNorm2d(out_channels),
+        nn.ReLU(inplace=True),
+    )
+
+class StudentCNN(nn.Module):
+    def __init__(self, num_classes: int):
+        super().__init__()
+        self.features = nn.Sequential(
+            conv_bn(3, 16, 2),                   # 112x112
+            depthwise_separable(16, 32, 2),      # 56x56
+            depthwise_separable(32, 64, 2),      # 28x28
+            depthwise_separable(64, 128, 2),     # 14x14
+            depthwise_separable(128, 128, 1),
+            depthwise_separable(128, 256, 2),    # 7x7
+            depthwise_separable(256, 256, 1),
+        )
+        self.pool = nn.AdaptiveAvgPool2d(1)
+        self.classifier = nn.Sequential(
+            nn.Dropout(0.2),
+            nn.Linear(256, num_classes),
+        )
+    
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        x = self.pool(self.features(x))
+        return self.classifier(torch.flatten(x, 1))
@@ -0,0 +1,153 @@
+import logging
+import math
+import os
+from typing import Dict, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+def detect_cpu_quota() -> float:
+    """Number of CPUs this container may use.
+    
+    Honours cgroup v2 (``cpu.max``) and v1 (``cpu.cfs_quota_us``) CPU limits,
+    then CPU affinity, then ``os.cpu_count()``.
+    """
+    available = float(len(os.sched_getaffinity(0))) if hasattr(os, 'sched_getaffinity') else float(os.cpu_count() or 1)
+    
+    quota = _read_cgroup_v2_quota()
+    if quota is None:
+        quota = _read_cgroup_v1_quota()
+    if quota is not None:
+        return max(min(quota, available), 0.1)
+    return available
+
+def _read_cgroup_v2_quota() -> Optional[float]:
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()[:2]
+        if quota == 'max':
+            return None
+        return int(quota) / int(period)
+    except (OSError, ValueError):
+        return None
+
+def _read_cgroup_v1_quota() -> Optional[float]:
+    try:
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+            quota = int(f.read())
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+            period = int(f.read())
+        if quota <= 0 or period <= 0:
+            return None
+        return quota / period
+    except (OSError, ValueError):
+        return None
+
+def detect_worker_count() -> int:
+    """Number of server worker processes sharing this container's CPUs"""
+    if settings.DISEASE_SERVER_WORKERS > 0:
+        return settings.DISEASE_SERVER_WORKERS
+    try:
+        return max(1, int(os.getenv('WEB_CONCURRENCY', '1')))
+    except ValueError:
+        return 1
+
+class ThreadBudget:
+    """Sizes torch's intra-op/inter-op thread pools so that all workers'
+    concurrent forward passes together fit the container's CPU quota.
+    """
+    
+    def __init__(self):
+        self.cpu_quota = 0.0
+        self.server_workers = 1
+        self.inference_workers = 1
+        self.intra_op_threads = 1
+        self.interop_threads = 1
+        self.applied = False
+        self.torch_configured = False
+        # Pid of a pre-fork master that must stay single-threaded
+        self._deferred_pid: Optional[int] = None
+    
+    def compute(self):
+        """Derive the budget from the CPU quota, worker count and settings"""
+        self.cpu_quota = detect_cpu_quota()
+        self.server_workers = detect_worker_count()
+        self.inference_workers = max(1, settings.DISEASE_INFERENCE_WORKERS)
+        
+        concurrent_passes = self.server_workers * self.inference_workers
+        if settings.DISEASE_TORCH_THREADS > 0:
+            self.intra_op_threads = settings.DISEASE_TORCH_THREADS
+        else:
+            self.intra_op_threads = max(1, math.floor(self.cpu_quota / concurrent_passes))
+        self.interop_threads = max(1, settings.DISEASE_TORCH_INTEROP_THREADS)
+    
+    def defer_until_fork(self):
+        """Keep torch single-threaded in a pre-fork master process.
+        
+        GNU OpenMP cannot be used in a forked child once the parent has run
+        a parallel region, so the master loads the model with one intra-op
+        thread and each worker applies the real budget after the fork.
+        """
+        if settings.DISEASE_INFERENCE_BACKEND != "onnxruntime":
+            import torch
+            
+            torch.set_num_threads(1)
+        self._deferred_pid = os.getpid()
+    
+    def apply(self):
+        """Compute the budget and configure torch unless serving with ONNX Runtime (once per process)"""
+        if self.applied or self._deferred_pid == os.getpid():
+            return
+        
+        self.compute()
+        self.applied = True
+        if settings.DISEASE_INFERENCE_BACKEND == "onnxruntime":
+            # The ONNX Runtime session takes its thread counts from the budget; torch is never imported
+            logger.info(
+                f"ONNX Runtime thread budget: {self.intra_op_threads} intra-op / {self.interop_threads} inter-op threads "
+                f"(CPU quota {self.cpu_quota:g}, {self.server_workers} server workers x "
+                f"{self.inference_workers} inference workers)"
+            )
+            return
+        self.configure_torch()
+    
+    def configure_torch(self):
+        """Apply the computed budget to torch's thread pools"""
+        if self.torch_configured or not self.applied:
+            return
+        import torch
+        
+        torch.set_num_threads(self.intra_op_threads)
+        try:
+            torch.set_num_interop_threads(self.interop_threads)
+        except RuntimeError as e:
+            # Can only be set before any inter-op parallel work has started
+            logger.warning(f"Could not set torch inter-op threads: {str(e)}")
+        self.torch_configured = True
+        logger.info(
+            f"Torch thread budget: {self.intra_op_threads} intra-op / {self.interop_threads} inter-op threads "
+            f"(CPU quota {self.cpu_quota:g}, {self.server_workers} server workers x "
+            f"{self.inference_workers} inference workers)"
+        )
+    
+    def get_status(self) -> Dict:
+        """Report the chosen budget"""
+        if not self.applied:
+            self.compute()
+        status = {
+            'applied': self.applied,
+            'cpu_quota': self.cpu_quota,
+            'server_workers': self.server_workers,
+            'inference_workers': self.inference_workers,
+            'intra_op_threads': self.intra_op_threads,
+            'interop_threads': self.interop_threads,
+        }
+        if self.torch_configured:
+            import torch
+            status['torch_num_threads'] = torch.get_num_threads()
+            status['torch_interop_threads'] = torch.get_num_interop_threads()
+        return status
+
+# Global thread budget instance
+thread_budget = ThreadBudget()
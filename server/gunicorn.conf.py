@@ -0,0 +1,42 @@
+"""
+Gunicorn configuration for production.
+
+Runs the FastAPI app on uvicorn workers. With
+``DISEASE_PRELOAD_BEFORE_FORK=true`` the app is preloaded: ``main`` is
+imported once in the master, which also loads the disease model, so all
+workers share a single copy-on-write copy of the weights instead of loading
+one each. Otherwise every worker imports the app itself.
+
+    gunicorn -c gunicorn.conf.py main:app
+"""
+import os
+
+from app.core.config import settings
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+# Workers size their torch thread pools from this (app/services/thread_budget.py),
+# so they must see the same count even when WEB_CONCURRENCY is unset
+os.environ["WEB_CONCURRENCY"] = str(workers)
+worker_class = "uvicorn.workers.UvicornWorker"
+# Preloading also runs main's module-level database setup in the master,
+# so it is only worth it (and only on) for the shared model weights
+preload_app = settings.DISEASE_PRELOAD_BEFORE_FORK
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+accesslog = "-"
+
+def post_fork(server, worker):
+    if preload_app:
+        # Drop the connection pool inherited from the master (create_all in
+        # main.py) without closing the master's sockets; each worker opens
+        # its own connections
+        from app.database import engine
+        engine.dispose(close=False)
+        
+        if settings.DISEASE_ML_ENABLED:
+            # The master loaded the model single-threaded; size torch's
+            # thread pools for this worker
+            from app.services.disease_detection import disease_detection_service
+            disease_detection_service.after_fork()
@@ -1,8 +1,10 @@
 from fastapi import FastAPI, HTTPException, Depends, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.staticfiles import StaticFiles
 import uvicorn
+import asyncio
 import os
 from pathlib import Path
 
@@ -20,10 +22,17 @@ from app.routers import (
 from app.database import engine, Base
 from app.core.config import settings
 from app.services.scheduler import scheduler_service
+from app.services.inference_queue import disease_inference_queue
+from app.services.disease_jobs import disease_job_queue
+from app.services.disease_detection import disease_detection_service
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
 
+# With gunicorn's preload_app this runs once in the master, before workers fork
+if settings.DISEASE_ML_ENABLED and settings.DISEASE_PRELOAD_BEFORE_FORK:
+    disease_detection_service.preload_for_fork()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="FarmIQ AI Agro Backend",
@@ -69,15 +78,41 @@ async def root():
 async def health_check():
     return {"status": "healthy", "message": "FarmIQ Backend is running"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 503 until the disease model is loaded and warmed up"""
+    if not settings.DISEASE_ML_ENABLED:
+        return {"status": "ready", "disease_detection": "disabled"}
+    if not settings.DISEASE_PRELOAD:
+        # Lazy mode: the model loads on the first disease request
+        return {"status": "ready", "disease_detection": "lazy"}
+    
+    readiness = disease_detection_service.get_readiness()
+    if not readiness["ready"]:
+        return JSONResponse(status_code=503, content={"status": "not ready", **readiness})
+    return {"status": "ready", **readiness}
+
 @app.on_event("startup")
 async def startup_event():
     """Start background services on app startup"""
     await scheduler_service.start_scheduler()
+    if settings.DISEASE_ML_ENABLED:
+        await disease_inference_queue.start()
+        await disease_job_queue.start()
+        if settings.DISEASE_PRELOAD:
+            # Warm up in the background; /ready reports 503 until it finishes
+            app.state.disease_warm_up = asyncio.create_task(disease_inference_queue.warm_up())
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Stop background services on app shutdown"""
     await scheduler_service.stop_scheduler()
+    warm_up = getattr(app.state, "disease_warm_up", None)
+    if warm_up is not None:
+        warm_up.cancel()
+    await disease_job_queue.stop()
+    await disease_inference_queue.stop()
+    disease_detection_service.shadow.stop()
 
 if __name__ == "__main__":
     uvicorn.run(
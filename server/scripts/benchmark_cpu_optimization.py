@@ -0,0 +1,132 @@
+"""
+Benchmark the CPU-optimized inference modes against the plain eager model.
+
+Builds every DISEASE_CPU_OPTIMIZATION mode ("channels_last", "frozen")
+from the float weights in MODEL_DIR, checks parity with the unoptimized
+model on the 39-class outputs (top-1 agreement, probability drift and
+accuracy for labelled images), and times forward passes at several batch
+sizes with the current torch thread count. Run it inside the production
+container image to pick the mode for its CPUs.
+
+Usage (from the server directory):
+    python -m scripts.benchmark_cpu_optimization --images path/to/holdout --min-agreement 0.999
+    python -m scripts.benchmark_cpu_optimization --batch-sizes 1,8,16 --iterations 20 --output cpu_opt.json
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+from typing import Dict, List
+
+import torch
+
+from app.services.cpu_optimization import CPU_OPTIMIZATION_MODES, optimize_for_cpu
+from app.services.disease_detection import disease_detection_service
+from scripts.benchmark_inference import parse_ints, summarize
+from scripts.image_sets import load_labeled_images, synthetic_images
+from scripts.parity import compare, label_to_class, predict_with, preprocess_all, print_report, run_batched, use_eager_float_model
+
+def time_forward(model, batch_sizes: List[int], iterations: int) -> Dict:
+    """Forward-pass latency percentiles and throughput per batch size"""
+    results = {}
+    for batch_size in batch_sizes:
+        batch = torch.rand(batch_size, 3, 224, 224)
+        for _ in range(2):
+            disease_detection_service.forward(model, batch)  # warm-up
+        latencies = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            disease_detection_service.forward(model, batch)
+            latencies.append(time.perf_counter() - start)
+        results[f"bs{batch_size}"] = {
+            'batch_size': batch_size,
+            **summarize(latencies),
+            'images_per_sec': batch_size * len(latencies) / sum(latencies),
+        }
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', help='Held-out image directory (optionally one sub-directory per class)')
+    parser.add_argument('--limit', type=int, default=256)
+    parser.add_argument('--synthetic', type=int, default=32, help='Synthetic images to use when --images is not given')
+    parser.add_argument('--batch-sizes', default='1,8,16')
+    parser.add_argument('--iterations', type=int, default=10, help='Timed forward passes per batch size')
+    parser.add_argument('--min-agreement', type=float, default=0.0, help='Exit non-zero if any mode\'s top-1 agreement falls below this (0-1)')
+    parser.add_argument('--output', help='Write the JSON report here')
+    args = parser.parse_args()
+    
+    use_eager_float_model()
+    service = disease_detection_service
+    service.ensure_loaded()
+    if service.model is None:
+        parser.error('No model loaded - check MODEL_DIR')
+    
+    if args.images:
+        samples = load_labeled_images(args.images, args.limit)
+    else:
+        samples = [(image_data, None) for image_data in synthetic_images(args.synthetic, 640, 480)]
+    if not samples:
+        parser.error('No images found')
+    
+    inputs = preprocess_all(service, [image_data for image_data, _ in samples])
+    labels = [label_to_class(service, label) for _, label in samples]
+    batch_sizes = parse_ints(args.batch_sizes)
+    
+    eager = service.model
+    reference, _ = run_batched(predict_with(eager), inputs, max(batch_sizes))
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'torch': torch.__version__,
+            'platform': platform.platform(),
+            'threads': torch.get_num_threads(),
+            'onednn': torch.backends.mkldnn.is_available(),
+            'model_path': service.model_path,
+            'images': len(samples),
+        },
+        'modes': {'off': {'forward': time_forward(eager, batch_sizes, args.iterations)}},
+    }
+    
+    failed = False
+    for mode in CPU_OPTIMIZATION_MODES:
+        start = time.perf_counter()
+        optimized = optimize_for_cpu(eager, mode)
+        build_ms = (time.perf_counter() - start) * 1000
+        candidate, _ = run_batched(predict_with(optimized), inputs, max(batch_sizes))
+        parity = compare(reference, candidate, labels)
+        report['modes'][mode] = {
+            'build_ms': build_ms,
+            'parity': parity,
+            'forward': time_forward(optimized, batch_sizes, args.iterations),
+        }
+        
+        print(f"== {mode} (built in {build_ms:.0f}ms)")
+        print_report(parity, 'eager', mode)
+        print()
+        if parity['top1_agreement'] < args.min_agreement:
+            failed = True
+    
+    baseline = report['modes']['off']['forward']
+    print(f"{'mode':<14} {'batch':>6} {'p50 ms':>9} {'p95 ms':>9} {'images/s':>10} {'speedup':>8}")
+    for mode, results in report['modes'].items():
+        for name, stats in results['forward'].items():
+            speedup = baseline[name]['p50_ms'] / stats['p50_ms']
+            stats['speedup_vs_off'] = speedup
+            print(
+                f"{mode:<14} {stats['batch_size']:>6} {stats['p50_ms']:>9.2f} "
+                f"{stats['p95_ms']:>9.2f} {stats['images_per_sec']:>10.1f} {speedup:>7.2f}x"
+            )
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.output}")
+    
+    if failed:
+        print(f"FAIL: top-1 agreement below {args.min_agreement * 100:.1f}%")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Compare the default and fast (JPEG draft mode) preprocessing paths.
+
+Reports decode+preprocess latency for both paths and, when a model is
+available, how often they agree on the top-1 class.
+
+Usage (from the server directory):
+    python -m scripts.benchmark_decode --images path/to/leaf/photos
+    python -m scripts.benchmark_decode --synthetic 20 --size 4000x3000
+"""
+import argparse
+import statistics
+import time
+from typing import List
+
+import numpy as np
+
+from app.services.disease_detection import disease_detection_service
+from scripts.image_sets import load_images, synthetic_images
+
+def time_path(images: List[bytes], fast_decode: bool, repeat: int):
+    """Return per-image latencies (ms) and the preprocessed tensors"""
+    latencies = []
+    tensors = []
+    for _ in range(repeat):
+        tensors = []
+        for image_data in images:
+            start = time.perf_counter()
+            tensors.append(disease_detection_service.preprocess_image_bytes(image_data, fast_decode=fast_decode, quality_gate=False))
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies, tensors
+
+def percentile(values: List[float], pct: float) -> float:
+    return float(np.percentile(values, pct)) if values else 0.0
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', help='Directory of sample images')
+    parser.add_argument('--limit', type=int, default=200, help='Maximum images to load from --images')
+    parser.add_argument('--synthetic', type=int, default=20, help='Synthetic JPEGs to generate when --images is not given')
+    parser.add_argument('--size', default='4000x3000', help='Synthetic image size, WIDTHxHEIGHT')
+    parser.add_argument('--repeat', type=int, default=3, help='Timing repetitions per image')
+    args = parser.parse_args()
+    
+    if args.images:
+        images = load_images(args.images, args.limit)
+    else:
+        width, height = (int(v) for v in args.size.lower().split('x'))
+        images = synthetic_images(args.synthetic, width, height)
+    if not images:
+        parser.error('No images found')
+    
+    disease_detection_service.ensure_loaded()
+    print(f"Benchmarking {len(images)} images x {args.repeat} repeats")
+    results = {}
+    for label, fast_decode in (('default', False), ('fast', True)):
+        latencies, tensors = time_path(images, fast_decode, args.repeat)
+        results[label] = tensors
+        print(
+            f"{label:>8}: mean {statistics.mean(latencies):7.2f}ms  "
+            f"p50 {percentile(latencies, 50):7.2f}ms  p95 {percentile(latencies, 95):7.2f}ms"
+        )
+    
+    if disease_detection_service.model is None:
+        print("No model loaded - skipping top-1 agreement check")
+        return
+    
+    import torch
+    default_top1 = disease_detection_service.run_inference(torch.cat(results['default'])).argmax(axis=1)
+    fast_top1 = disease_detection_service.run_inference(torch.cat(results['fast'])).argmax(axis=1)
+    agreement = float((default_top1 == fast_top1).mean()) * 100
+    print(f"Top-1 agreement: {agreement:.1f}% ({int((default_top1 == fast_top1).sum())}/{len(images)})")
+
+if __name__ == '__main__':
+    main()
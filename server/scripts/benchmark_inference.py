@@ -0,0 +1,188 @@
+"""
+Reproducible benchmark for the disease detection pipeline.
+
+Times each stage separately - base64 decode, image decode, preprocess
+(resize + tensor), forward pass and post-process (payload building) - and
+reports p50/p95/p99 latency plus forward-pass images/sec for every
+combination of batch size and torch thread count. Results are written
+as JSON and can be compared against a stored baseline so regressions in
+DiseaseDetectionService show up as a non-zero exit code.
+
+Usage (from the server directory):
+    python -m scripts.benchmark_inference --output bench.json
+    python -m scripts.benchmark_inference --images samples/ --batch-sizes 1,8,32 --threads 1,2,4 \\
+        --baseline benchmarks/baseline.json --tolerance 0.15
+"""
+import argparse
+import base64
+import json
+import platform
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+import numpy as np
+import torch
+
+from app.core.config import settings
+from app.services.disease_detection import disease_detection_service
+from app.services.thread_budget import detect_cpu_quota
+from scripts.image_sets import load_images, synthetic_images
+
+def summarize(latencies: List[float]) -> Dict[str, float]:
+    """Latency percentiles in milliseconds"""
+    values = np.array(latencies) * 1000
+    return {
+        'mean_ms': float(values.mean()),
+        'p50_ms': float(np.percentile(values, 50)),
+        'p95_ms': float(np.percentile(values, 95)),
+        'p99_ms': float(np.percentile(values, 99)),
+    }
+
+def time_each(func: Callable, items: List, repeat: int) -> List[float]:
+    """Time ``func(item)`` for every item, ``repeat`` times"""
+    latencies = []
+    for _ in range(repeat):
+        for item in items:
+            start = time.perf_counter()
+            func(item)
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+def benchmark_stages(images: List[bytes], repeat: int) -> Dict:
+    service = disease_detection_service
+    encoded = [base64.b64encode(image_data).decode() for image_data in images]
+    decoded = [service.decode_image(image_data) for image_data in images]
+    tensors = [service.image_to_tensor(image) for image in decoded]
+    probabilities = service.run_inference(torch.cat(tensors))
+    
+    stages = {
+        'base64_decode': time_each(service.decode_base64_image, encoded, repeat),
+        'image_decode': time_each(service.decode_image, images, repeat),
+        'preprocess': time_each(service.image_to_tensor, decoded, repeat),
+        'postprocess': time_each(service.build_prediction, list(probabilities), repeat),
+    }
+    return {name: summarize(latencies) for name, latencies in stages.items()}
+
+def benchmark_forward(batch_sizes: List[int], thread_counts: List[int], iterations: int) -> Dict:
+    results = {}
+    for threads in thread_counts:
+        torch.set_num_threads(threads)
+        for batch_size in batch_sizes:
+            batch = torch.rand(batch_size, 3, 224, 224)
+            disease_detection_service.run_inference(batch)  # warm-up
+            latencies = time_each(disease_detection_service.run_inference, [batch] * iterations, 1)
+            results[f"bs{batch_size}_t{threads}"] = {
+                'batch_size': batch_size,
+                'threads': threads,
+                **summarize(latencies),
+                'images_per_sec': batch_size * len(latencies) / sum(latencies),
+            }
+    return results
+
+def compare_to_baseline(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Return a description of every metric that regressed by more than ``tolerance``"""
+    regressions = []
+    
+    def check(label: str, current: Dict, previous: Dict):
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if metric in current and previous.get(metric):
+                change = current[metric] / previous[metric] - 1
+                if change > tolerance:
+                    regressions.append(f"{label} {metric}: {previous[metric]:.2f} -> {current[metric]:.2f} (+{change * 100:.0f}%)")
+        if 'images_per_sec' in current and previous.get('images_per_sec'):
+            change = current['images_per_sec'] / previous['images_per_sec'] - 1
+            if change < -tolerance:
+                regressions.append(
+                    f"{label} images/sec: {previous['images_per_sec']:.1f} -> {current['images_per_sec']:.1f} ({change * 100:.0f}%)"
+                )
+    
+    for name, current in report['stages'].items():
+        if name in baseline.get('stages', {}):
+            check(f"stage {name}", current, baseline['stages'][name])
+    for name, current in report['forward'].items():
+        if name in baseline.get('forward', {}):
+            check(f"forward {name}", current, baseline['forward'][name])
+    return regressions
+
+def print_report(report: Dict):
+    print(f"{'stage':<16} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, stats in report['stages'].items():
+        print(f"{name:<16} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}")
+    print()
+    print(f"{'batch':>6} {'threads':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'images/s':>10}")
+    for stats in report['forward'].values():
+        print(
+            f"{stats['batch_size']:>6} {stats['threads']:>8} {stats['p50_ms']:>9.2f} "
+            f"{stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f} {stats['images_per_sec']:>10.1f}"
+        )
+
+def parse_ints(value: str) -> List[int]:
+    return [int(v) for v in value.split(',') if v.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', help='Directory of sample leaf images (synthetic JPEGs otherwise)')
+    parser.add_argument('--limit', type=int, default=64)
+    parser.add_argument('--synthetic', type=int, default=16)
+    parser.add_argument('--size', default='1600x1200', help='Synthetic image size, WIDTHxHEIGHT')
+    parser.add_argument('--batch-sizes', default='1,4,16')
+    parser.add_argument('--threads', default='', help='Comma-separated torch thread counts (default: current budget)')
+    parser.add_argument('--iterations', type=int, default=20, help='Forward passes per batch size / thread count')
+    parser.add_argument('--repeat', type=int, default=3, help='Passes over the images for per-image stages')
+    parser.add_argument('--output', help='Write the JSON report here')
+    parser.add_argument('--baseline', help='Compare against this JSON report')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='Allowed relative regression vs the baseline')
+    args = parser.parse_args()
+    
+    disease_detection_service.ensure_loaded()
+    if disease_detection_service.model is None:
+        parser.error('No model loaded - check MODEL_DIR')
+    
+    if args.images:
+        images = load_images(args.images, args.limit)
+    else:
+        width, height = (int(v) for v in args.size.lower().split('x'))
+        images = synthetic_images(args.synthetic, width, height)
+    if not images:
+        parser.error('No images found')
+    
+    thread_counts = parse_ints(args.threads) or [torch.get_num_threads()]
+    
+    report = {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'torch': torch.__version__,
+            'platform': platform.platform(),
+            'cpu_quota': detect_cpu_quota(),
+            'model_path': disease_detection_service.model_path,
+            'inference_backend': settings.DISEASE_INFERENCE_BACKEND,
+            'fast_decode': settings.DISEASE_FAST_DECODE,
+            'images': len(images),
+            'image_source': args.images or f"synthetic {args.size}",
+        },
+        'stages': benchmark_stages(images, args.repeat),
+        'forward': benchmark_forward(parse_ints(args.batch_sizes), thread_counts, args.iterations),
+    }
+    print_report(report)
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.output}")
+    
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance * 100:.0f}% vs {args.baseline}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.tolerance * 100:.0f}% vs {args.baseline}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Throughput vs torch thread count for the disease model.
+
+For each intra-op thread count, ``--concurrency`` caller threads run
+forward passes at the same time (emulating several workers sharing the
+CPU) and the script reports images/sec and p50/p99 batch latency. The
+row marked ``*`` is what the thread budget would choose for that
+concurrency on this machine.
+
+Usage (from the server directory):
+    python -m scripts.benchmark_threads --concurrency 4 --batch-size 8
+"""
+import argparse
+import threading
+import time
+from typing import List
+
+import numpy as np
+import torch
+
+from app.services.disease_detection import disease_detection_service
+from app.services.thread_budget import detect_cpu_quota
+
+def run(concurrency: int, batch_size: int, iterations: int) -> List[float]:
+    """Run ``iterations`` batches on each of ``concurrency`` threads; return batch latencies"""
+    batch = torch.rand(batch_size, 3, 224, 224)
+    latencies: List[float] = []
+    lock = threading.Lock()
+    
+    def caller():
+        local = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            disease_detection_service.run_inference(batch)
+            local.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(local)
+    
+    threads = [threading.Thread(target=caller) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', default='', help='Comma-separated thread counts (default: 1,2,4,... up to the CPU count)')
+    parser.add_argument('--concurrency', type=int, default=1, help='Simultaneous forward passes')
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--iterations', type=int, default=10, help='Batches per caller per thread count')
+    args = parser.parse_args()
+    
+    disease_detection_service.ensure_loaded()
+    if disease_detection_service.model is None:
+        parser.error('No model loaded - check MODEL_DIR')
+    
+    cpu_quota = detect_cpu_quota()
+    if args.threads:
+        thread_counts = [int(t) for t in args.threads.split(',')]
+    else:
+        thread_counts = []
+        count = 1
+        while count <= max(1, int(round(cpu_quota))):
+            thread_counts.append(count)
+            count *= 2
+    budget_choice = max(1, int(cpu_quota // args.concurrency))
+    
+    # Warm up allocator and kernel selection
+    run(1, args.batch_size, 2)
+    
+    print(f"CPU quota {cpu_quota:g}, concurrency {args.concurrency}, batch size {args.batch_size}")
+    print(f"{'threads':>8} {'images/s':>10} {'p50 ms':>9} {'p99 ms':>9}")
+    for threads in thread_counts:
+        torch.set_num_threads(threads)
+        start = time.perf_counter()
+        latencies = run(args.concurrency, args.batch_size, args.iterations)
+        elapsed = time.perf_counter() - start
+        throughput = len(latencies) * args.batch_size / elapsed
+        marker = '*' if threads == budget_choice else ' '
+        print(
+            f"{threads:>7}{marker} {throughput:>10.1f} "
+            f"{np.percentile(latencies, 50) * 1000:>9.1f} {np.percentile(latencies, 99) * 1000:>9.1f}"
+        )
+
+if __name__ == '__main__':
+    main()
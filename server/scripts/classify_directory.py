@@ -0,0 +1,228 @@
+"""
+Classify every image in a directory tree with the disease model.
+
+Images are streamed from ``input``, decoded and preprocessed in a pool of
+worker processes while the main process runs large forward passes, and
+results are appended to the output after every batch. Re-running the same
+command skips images already present in the output, so an interrupted run
+resumes where it stopped.
+
+Output is a CSV file, or - for a ``.parquet`` path - a directory of
+Parquet part files (read it back with ``pandas.read_parquet(path)``;
+needs pyarrow).
+
+Usage (from the server directory):
+    python -m scripts.classify_directory /data/leaves results.csv
+    python -m scripts.classify_directory /data/leaves results.parquet --batch-size 128 --workers 8 --fast-decode
+"""
+import argparse
+import csv
+import io
+import itertools
+import multiprocessing
+import os
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+import torch
+
+from app.services.disease_detection import ImageRejected, disease_detection_service
+from scripts.image_sets import IMAGE_EXTENSIONS
+
+COLUMNS = ['path', 'class_index', 'disease_name', 'confidence_score', 'raw_confidence', 'severity', 'error']
+
+def iter_image_paths(directory: str) -> Iterator[str]:
+    """Yield image paths relative to ``directory`` in a stable order"""
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.relpath(os.path.join(root, name), directory)
+
+def batched(items: Iterator[str], size: int) -> Iterator[List[str]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+class CsvResultWriter:
+    """Append-only CSV output"""
+    
+    def __init__(self, path: str):
+        self.path = path
+    
+    def completed_paths(self) -> Set[str]:
+        if not os.path.exists(self.path):
+            return set()
+        self._drop_partial_line()
+        with open(self.path, 'r', newline='', encoding='utf-8') as f:
+            return {row['path'] for row in csv.DictReader(f)}
+    
+    def _drop_partial_line(self):
+        """Cut a row left half-written by an interrupted run"""
+        with open(self.path, 'rb+') as f:
+            data = f.read()
+            if data and not data.endswith(b'\n'):
+                f.truncate(data.rfind(b'\n') + 1)
+    
+    def write(self, rows: List[dict]):
+        new_file = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=COLUMNS, lineterminator='\n')
+        if new_file:
+            writer.writeheader()
+        writer.writerows(rows)
+        # One write per batch keeps a crash from interleaving partial rows
+        with open(self.path, 'a', newline='', encoding='utf-8') as f:
+            f.write(buffer.getvalue())
+            f.flush()
+            os.fsync(f.fileno())
+
+class ParquetResultWriter:
+    """Parquet dataset output: one part file per batch"""
+    
+    def __init__(self, path: str):
+        import pandas as pd
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            sys.exit('Parquet output needs pyarrow (pip install pyarrow); use a .csv output instead')
+        self.pd = pd
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.parts = len(self._part_files())
+    
+    def _part_files(self) -> List[str]:
+        return sorted(name for name in os.listdir(self.path) if name.endswith('.parquet'))
+    
+    def completed_paths(self) -> Set[str]:
+        completed = set()
+        for name in self._part_files():
+            completed.update(self.pd.read_parquet(os.path.join(self.path, name), columns=['path'])['path'])
+        return completed
+    
+    def write(self, rows: List[dict]):
+        part_path = os.path.join(self.path, f"part-{self.parts:06d}.parquet")
+        tmp_path = f"{part_path}.tmp"
+        self.pd.DataFrame(rows, columns=COLUMNS).to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, part_path)
+        self.parts += 1
+
+def _init_loader():
+    # Decoding is spread over processes; one torch thread each avoids oversubscription
+    torch.set_num_threads(1)
+
+LoadedImage = Tuple[str, Optional[np.ndarray], Optional[str], Optional[Dict]]
+
+def load_image(task: Tuple[str, str, bool]) -> LoadedImage:
+    """Decode and preprocess one image (runs in a loader process).
+    
+    Returns the path, the 224x224x3 uint8 pixels, an error message and, for
+    images rejected by the quality gate, their prediction payload.
+    """
+    directory, relative_path, fast_decode = task
+    try:
+        with open(os.path.join(directory, relative_path), 'rb') as f:
+            image_data = f.read()
+        pixels = disease_detection_service.preprocess_image_pixels(image_data, fast_decode=fast_decode)
+        return relative_path, pixels, None, None
+    except ImageRejected as e:
+        return relative_path, None, None, e.prediction
+    except (OSError, ValueError) as e:
+        return relative_path, None, str(e), None
+
+def prediction_row(relative_path: str, prediction: Dict, class_index: Optional[int], raw_confidence: Optional[float]) -> dict:
+    return {
+        'path': relative_path,
+        'class_index': class_index,
+        'disease_name': prediction['disease_name'],
+        'confidence_score': prediction['confidence_score'],
+        'raw_confidence': raw_confidence,
+        'severity': prediction['severity'],
+        'error': None,
+    }
+
+def classify(loaded: List[LoadedImage]) -> List[dict]:
+    """Run one forward pass over the decoded images of a batch"""
+    service = disease_detection_service
+    rows = []
+    valid = []
+    for relative_path, array, error, prediction in loaded:
+        if prediction is not None:
+            rows.append(prediction_row(relative_path, prediction, None, None))
+        elif array is None:
+            rows.append({'path': relative_path, 'error': error})
+        else:
+            valid.append((relative_path, array))
+    
+    if valid:
+        probabilities = service.run_inference_pixels([array for _, array in valid])
+        for (relative_path, _), row in zip(valid, probabilities):
+            class_index = int(np.argmax(row))
+            rows.append(prediction_row(relative_path, service.build_prediction(row), class_index, float(row[class_index])))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('input', help='Directory of images (searched recursively)')
+    parser.add_argument('output', help='Results file (.csv) or Parquet dataset directory (.parquet)')
+    parser.add_argument('--batch-size', type=int, default=64, help='Images per forward pass')
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) - 1), help='Decode processes')
+    parser.add_argument('--fast-decode', action='store_true', help='Use JPEG draft-mode decoding')
+    parser.add_argument('--limit', type=int, default=0, help='Stop after this many new images (0 = all)')
+    args = parser.parse_args()
+    
+    if not os.path.isdir(args.input):
+        parser.error(f'Not a directory: {args.input}')
+    
+    writer = ParquetResultWriter(args.output) if args.output.endswith('.parquet') else CsvResultWriter(args.output)
+    completed = writer.completed_paths()
+    if completed:
+        print(f"Resuming: {len(completed)} images already classified")
+    
+    pending = (path for path in iter_image_paths(args.input) if path not in completed)
+    if args.limit:
+        pending = itertools.islice(pending, args.limit)
+    batches = batched(pending, max(1, args.batch_size))
+    
+    processed = 0
+    failed = 0
+    start = time.perf_counter()
+    context = multiprocessing.get_context('fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn')
+    # Start the loaders before torch is initialised in this process: forking
+    # after its thread pools exist is not safe
+    with context.Pool(max(1, args.workers), initializer=_init_loader) as pool:
+        service = disease_detection_service
+        service.ensure_loaded()
+        if service.model is None:
+            parser.error('No model loaded - check MODEL_DIR')
+        
+        def submit(paths):
+            if paths is None:
+                return None
+            return pool.map_async(load_image, [(args.input, path, args.fast_decode) for path in paths], chunksize=4)
+        
+        # Decode the next batch while the current one runs through the model
+        in_flight = submit(next(batches, None))
+        while in_flight is not None:
+            loaded = in_flight.get()
+            in_flight = submit(next(batches, None))
+            
+            rows = classify(loaded)
+            writer.write(rows)
+            processed += len(rows)
+            failed += sum(1 for row in rows if row.get('error'))
+            
+            elapsed = time.perf_counter() - start
+            print(f"{processed} images ({failed} failed), {processed / elapsed:.1f} img/s", flush=True)
+    
+    print(f"Done: {processed} new images classified in {time.perf_counter() - start:.1f}s -> {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,185 @@
+"""
+Distil the full disease CNN into the small first-tier cascade model.
+
+Trains ``StudentCNN`` to match the full model's softened output
+distribution (knowledge distillation) on a directory of leaf images.
+Labels are not required: images in ``<dir>/<label>/`` add a hard-label
+loss term weighted by ``--alpha`` when the label is a class index or
+disease name, but the teacher's soft targets are enough on their own.
+
+After training, a held-out split reports student/teacher agreement and
+the escalation rate the cascade thresholds would produce, and the weights
+are written to ``<model>.student.pth`` next to the active model, where
+``DiseaseDetectionService`` picks them up when DISEASE_CASCADE_ENABLED is
+set.
+
+Usage (from the server directory):
+    python -m scripts.distill_student --images samples/ --epochs 10
+    python -m scripts.distill_student --images samples/ --epochs 20 --temperature 4 --alpha 0.3 --output student.pth
+"""
+import argparse
+import random
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+from app.core.config import settings
+
+# The teacher must be the full model, never a previous cascade
+settings.DISEASE_CASCADE_ENABLED = False
+
+from app.services.disease_detection import NUM_CLASSES, disease_detection_service
+from app.services.student_model import StudentCNN
+from scripts.image_sets import load_labeled_images
+from scripts.parity import label_to_class
+
+def preprocess(images: List[Tuple[bytes, Optional[str]]]) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Decode all images once; unknown labels become -1"""
+    service = disease_detection_service
+    tensors = []
+    labels = []
+    for image_data, label in images:
+        try:
+            tensors.append(service.preprocess_image_bytes(image_data, fast_decode=True, quality_gate=False))
+        except ValueError:
+            continue
+        class_index = label_to_class(service, label)
+        labels.append(class_index if class_index is not None else -1)
+    return torch.cat(tensors), torch.tensor(labels)
+
+def teacher_logits(batch: torch.Tensor) -> torch.Tensor:
+    """Logits of the full model"""
+    with torch.no_grad():
+        return disease_detection_service.model(batch)
+
+def augment(batch: torch.Tensor) -> torch.Tensor:
+    """Random horizontal flips; leaves are orientation invariant"""
+    flip = torch.rand(len(batch)) < 0.5
+    batch = batch.clone()
+    batch[flip] = batch[flip].flip(-1)
+    return batch
+
+def distillation_loss(student_logits: torch.Tensor, teacher: torch.Tensor, labels: torch.Tensor, temperature: float, alpha: float) -> torch.Tensor:
+    soft = F.kl_div(
+        F.log_softmax(student_logits / temperature, dim=1),
+        F.softmax(teacher / temperature, dim=1),
+        reduction='batchmean'
+    ) * temperature ** 2
+    labelled = labels >= 0
+    if alpha <= 0 or not labelled.any():
+        return soft
+    hard = F.cross_entropy(student_logits[labelled], labels[labelled])
+    return (1 - alpha) * soft + alpha * hard
+
+def evaluate(student: StudentCNN, inputs: torch.Tensor, batch_size: int) -> dict:
+    """Agreement with the teacher and the cascade's escalation rate on held-out images"""
+    student.eval()
+    service = disease_detection_service
+    student_probabilities = []
+    teacher_probabilities = []
+    for start in range(0, len(inputs), batch_size):
+        batch = inputs[start:start + batch_size]
+        student_probabilities.append(service.forward(student, batch))
+        teacher_probabilities.append(service.forward(service.model, batch))
+    student_probabilities = np.concatenate(student_probabilities)
+    teacher_probabilities = np.concatenate(teacher_probabilities)
+    
+    agree = student_probabilities.argmax(1) == teacher_probabilities.argmax(1)
+    escalate = service.needs_escalation(student_probabilities)
+    cascade_agree = np.where(escalate, True, agree)
+    return {
+        'images': len(inputs),
+        'student_agreement': float(agree.mean()),
+        'escalation_rate': float(escalate.mean()),
+        'cascade_agreement': float(cascade_agree.mean()),
+        'agreement_when_not_escalated': float(agree[~escalate].mean()) if (~escalate).any() else None,
+    }
+
+def time_forward(model, batch: torch.Tensor, repeat: int = 5) -> float:
+    disease_detection_service.forward(model, batch)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        disease_detection_service.forward(model, batch)
+    return (time.perf_counter() - start) / repeat * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', required=True, help='Directory of leaf images (optionally in <label>/ subdirectories)')
+    parser.add_argument('--limit', type=int, default=5000, help='Maximum images to load')
+    parser.add_argument('--epochs', type=int, default=10)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--lr', type=float, default=1e-3)
+    parser.add_argument('--temperature', type=float, default=4.0, help='Softmax temperature for the soft targets')
+    parser.add_argument('--alpha', type=float, default=0.0, help='Weight of the hard-label loss for labelled images')
+    parser.add_argument('--val-fraction', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Output path (default: <weights>.student.pth)')
+    args = parser.parse_args()
+    
+    random.seed(args.seed)
+    torch.manual_seed(args.seed)
+    
+    service = disease_detection_service
+    service.ensure_loaded()
+    if service.model is None:
+        parser.error('No model loaded - check MODEL_DIR')
+    
+    images = load_labeled_images(args.images, args.limit)
+    if len(images) < 2:
+        parser.error(f'Need at least 2 images in {args.images}')
+    random.shuffle(images)
+    inputs, labels = preprocess(images)
+    val_count = max(1, int(len(inputs) * args.val_fraction))
+    train_inputs, train_labels = inputs[val_count:], labels[val_count:]
+    val_inputs = inputs[:val_count]
+    print(f"Training on {len(train_inputs)} images, validating on {val_count}")
+    
+    student = StudentCNN(NUM_CLASSES)
+    optimizer = torch.optim.AdamW(student.parameters(), lr=args.lr, weight_decay=1e-4)
+    scheduler = torch.optim.lr_scheduler.CosineAnnealingLR(optimizer, T_max=max(1, args.epochs))
+    
+    for epoch in range(args.epochs):
+        student.train()
+        order = torch.randperm(len(train_inputs))
+        total_loss = 0.0
+        for start in range(0, len(order), args.batch_size):
+            indices = order[start:start + args.batch_size]
+            batch = augment(train_inputs[indices])
+            loss = distillation_loss(student(batch), teacher_logits(batch), train_labels[indices], args.temperature, args.alpha)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total_loss += loss.item() * len(indices)
+        scheduler.step()
+        
+        report = evaluate(student, val_inputs, args.batch_size)
+        print(
+            f"Epoch {epoch + 1}/{args.epochs}: loss {total_loss / len(train_inputs):.4f}, "
+            f"agreement {report['student_agreement']:.3f}, escalation {report['escalation_rate']:.3f}"
+        )
+    
+    student.eval()
+    report = evaluate(student, val_inputs, args.batch_size)
+    timing_batch = val_inputs[:min(len(val_inputs), args.batch_size)]
+    student_ms = time_forward(student, timing_batch)
+    teacher_ms = time_forward(service.model, timing_batch)
+    
+    print()
+    print(f"Held-out images:               {report['images']}")
+    print(f"Student/teacher agreement:     {report['student_agreement']:.3f}")
+    print(
+        f"Escalation rate:               {report['escalation_rate']:.3f} "
+        f"(confidence < {settings.DISEASE_CASCADE_MIN_CONFIDENCE}, margin < {settings.DISEASE_CASCADE_MIN_MARGIN})"
+    )
+    print(f"Cascade agreement:             {report['cascade_agreement']:.3f}")
+    print(f"Forward pass ({len(timing_batch)} images): student {student_ms:.1f}ms, full model {teacher_ms:.1f}ms")
+    
+    output = args.output or service.get_student_path(service.model_path)
+    torch.save(student.state_dict(), output)
+    print(f"Saved student model: {output}")
+
+if __name__ == '__main__':
+    main()
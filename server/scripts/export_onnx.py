@@ -0,0 +1,83 @@
+"""
+Export the disease model to ONNX and check parity with PyTorch.
+
+Writes ``<model>.onnx`` next to the ``.pt`` weights (dynamic batch axis),
+then runs the same images through PyTorch and ONNX Runtime and compares
+the 39-class outputs. Set ``DISEASE_INFERENCE_BACKEND=onnxruntime`` to
+serve the exported model.
+
+Needs the ``onnx`` package from requirements-export.txt.
+
+Usage (from the server directory):
+    python -m scripts.export_onnx [--images path/to/holdout] [--min-agreement 0.99]
+"""
+import argparse
+import sys
+
+import torch
+
+from app.core.config import settings
+from app.services.disease_detection import NUM_CLASSES, disease_detection_service
+from app.services.onnx_model import OnnxRuntimeModel
+from scripts.image_sets import load_labeled_images, synthetic_images
+from scripts.parity import compare, label_to_class, predict_with, preprocess_all, print_report, run_batched, use_eager_float_model
+
+def export(model: torch.nn.Module, output: str, opset: int):
+    model.eval()
+    example = torch.rand(1, 3, 224, 224)
+    torch.onnx.export(
+        model,
+        example,
+        output,
+        input_names=['input'],
+        output_names=['logits'],
+        dynamic_axes={'input': {0: 'batch'}, 'logits': {0: 'batch'}},
+        opset_version=opset,
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', help='Output path (default: <weights>.onnx)')
+    parser.add_argument('--opset', type=int, default=17)
+    parser.add_argument('--images', help='Image directory for the parity check (optionally one sub-directory per class)')
+    parser.add_argument('--limit', type=int, default=500)
+    parser.add_argument('--synthetic', type=int, default=32, help='Synthetic images to use when --images is not given')
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--min-agreement', type=float, default=0.0, help='Exit non-zero if top-1 agreement falls below this (0-1)')
+    args = parser.parse_args()
+    
+    use_eager_float_model()
+    service = disease_detection_service
+    service.ensure_loaded()
+    if service.model is None:
+        parser.error('No model loaded - check MODEL_DIR')
+    
+    output = args.output or service.get_onnx_path(service.model_path)
+    export(service.model, output, args.opset)
+    print(f"Saved ONNX model: {output}")
+    
+    if args.images:
+        samples = load_labeled_images(args.images, args.limit)
+    else:
+        samples = [(image_data, None) for image_data in synthetic_images(args.synthetic, 640, 480)]
+    inputs = preprocess_all(service, [image_data for image_data, _ in samples])
+    labels = [label_to_class(service, label) for _, label in samples]
+    
+    onnx_model = OnnxRuntimeModel(output, intra_op_threads=settings.DISEASE_ORT_INTRA_OP_THREADS)
+    
+    reference, torch_latency = run_batched(predict_with(service.model), inputs, args.batch_size)
+    candidate, ort_latency = run_batched(predict_with(onnx_model), inputs, args.batch_size)
+    if candidate.shape[1] != NUM_CLASSES:
+        print(f"FAIL: ONNX model returns {candidate.shape[1]} classes, expected {NUM_CLASSES}")
+        sys.exit(1)
+    
+    report = compare(reference, candidate, labels)
+    print_report(report, 'PyTorch', 'ONNX Runtime')
+    print(f"Latency per image:        PyTorch {torch_latency * 1000:.2f}ms, ONNX Runtime {ort_latency * 1000:.2f}ms")
+    
+    if report['top1_agreement'] < args.min_agreement:
+        print(f"FAIL: top-1 agreement below {args.min_agreement * 100:.1f}%")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
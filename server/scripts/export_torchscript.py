@@ -0,0 +1,60 @@
+"""
+Build the frozen TorchScript artifact for the disease model.
+
+Traces the CNN loaded from MODEL_DIR, freezes it (weights become graph
+constants, conv/bn folding) and writes ``<model>.torchscript`` next to the
+``.pt`` weights. ``DiseaseDetectionService.load_model`` prefers that file
+when it is newer than the weights, so workers no longer import ``CNN.py``,
+and applies ``torch.jit.optimize_for_inference`` (oneDNN operator fusion)
+after loading - the fused graph itself cannot be serialized.
+
+Usage (from the server directory):
+    python -m scripts.export_torchscript [--quantize] [--output path]
+"""
+import argparse
+import time
+
+import torch
+
+from app.services.disease_detection import disease_detection_service
+from scripts.parity import use_eager_float_model
+
+def export(model: torch.nn.Module, batch_size: int = 1) -> torch.jit.ScriptModule:
+    """Trace and freeze ``model`` for CPU inference"""
+    model.eval()
+    example = torch.rand(batch_size, 3, 224, 224)
+    with torch.no_grad():
+        return torch.jit.freeze(torch.jit.trace(model, example))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--quantize', action='store_true', help='Export the int8 dynamically quantized model')
+    parser.add_argument('--output', help='Output path (default: <weights>.torchscript)')
+    args = parser.parse_args()
+    
+    use_eager_float_model()
+    service = disease_detection_service
+    service.ensure_loaded()
+    if service.model is None:
+        parser.error('No model loaded - check MODEL_DIR')
+    
+    model = service.quantize_model(service.model) if args.quantize else service.model
+    output = args.output or service.get_torchscript_path(service.model_path)
+    
+    frozen = export(model)
+    
+    # Sanity check: the frozen graph must reproduce the eager outputs
+    check = torch.rand(4, 3, 224, 224)
+    with torch.no_grad():
+        max_delta = (model(check) - frozen(check)).abs().max().item()
+    print(f"Max |logit delta| vs eager model: {max_delta:.6f}")
+    
+    frozen.save(output)
+    print(f"Saved TorchScript model: {output}")
+    
+    start = time.perf_counter()
+    service.load_torchscript_model(output)
+    print(f"Reload time: {(time.perf_counter() - start) * 1000:.1f}ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+Helpers for loading evaluation and benchmark images.
+"""
+import io
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.webp')
+
+def load_images(directory: str, limit: int) -> List[bytes]:
+    """Read up to ``limit`` image files from a directory"""
+    return [image_data for image_data, _ in load_labeled_images(directory, limit)]
+
+def load_labeled_images(directory: str, limit: int) -> List[Tuple[bytes, Optional[str]]]:
+    """Read up to ``limit`` images, labelled by their sub-directory name.
+    
+    Images directly inside ``directory`` get a label of ``None``; images in
+    ``directory/<label>/`` are labelled ``<label>`` (a class index or a
+    disease name).
+    """
+    images = []
+    for root, _, files in sorted(os.walk(directory)):
+        label = None if os.path.samefile(root, directory) else os.path.basename(root)
+        for name in sorted(files):
+            if not name.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            with open(os.path.join(root, name), 'rb') as f:
+                images.append((f.read(), label))
+            if len(images) >= limit:
+                return images
+    return images
+
+def synthetic_images(count: int, width: int, height: int, seed: int = 0) -> List[bytes]:
+    """Generate smooth random JPEGs roughly the size of phone photos"""
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(count):
+        small = rng.integers(0, 256, size=(max(1, height // 64), max(1, width // 64), 3), dtype=np.uint8)
+        image = Image.fromarray(small).resize((width, height), Image.BILINEAR)
+        buffer = io.BytesIO()
+        image.save(buffer, format='JPEG', quality=90)
+        images.append(buffer.getvalue())
+    return images
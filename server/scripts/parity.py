@@ -0,0 +1,76 @@
+"""
+Shared helpers for comparing a candidate inference path against the float
+PyTorch model on the 39-class output.
+"""
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import torch
+
+from app.core.config import settings
+from app.services.disease_detection import DiseaseDetectionService
+
+def use_eager_float_model():
+    """Make the service load the eager float PyTorch model, not an exported or optimized artifact"""
+    settings.DISEASE_USE_TORCHSCRIPT = False
+    settings.DISEASE_QUANTIZE = False
+    settings.DISEASE_INFERENCE_BACKEND = "torch"
+    settings.DISEASE_CPU_OPTIMIZATION = "off"
+
+def predict_with(model) -> Callable[[torch.Tensor], np.ndarray]:
+    """Batch -> probabilities function for ``run_batched``"""
+    return lambda batch: DiseaseDetectionService.forward(model, batch)
+
+def preprocess_all(service: DiseaseDetectionService, images: List[bytes]) -> torch.Tensor:
+    """Preprocess every image into one Nx3x224x224 tensor"""
+    return torch.cat([service.preprocess_image_bytes(image_data, quality_gate=False) for image_data in images])
+
+def run_batched(predict: Callable[[torch.Tensor], np.ndarray], inputs: torch.Tensor, batch_size: int):
+    """Run ``predict`` over ``inputs`` in batches; return (probabilities, seconds per image)"""
+    outputs = []
+    start = time.perf_counter()
+    for offset in range(0, len(inputs), batch_size):
+        outputs.append(predict(inputs[offset:offset + batch_size]))
+    elapsed = time.perf_counter() - start
+    return np.concatenate(outputs), elapsed / max(1, len(inputs))
+
+def label_to_class(service: DiseaseDetectionService, label: Optional[str]) -> Optional[int]:
+    """Map a directory label (class index or disease name) to a class index"""
+    if label is None:
+        return None
+    if label.isdigit():
+        return int(label)
+    normalized = label.strip().lower()
+    for class_index, knowledge in enumerate(service.knowledge_table):
+        if knowledge.disease_name.strip().lower() == normalized:
+            return class_index
+    return None
+
+def compare(reference: np.ndarray, candidate: np.ndarray, labels: List[Optional[int]]) -> Dict:
+    """Summarize how closely ``candidate`` probabilities track ``reference``"""
+    reference_top1 = reference.argmax(axis=1)
+    candidate_top1 = candidate.argmax(axis=1)
+    report = {
+        'images': int(len(reference)),
+        'top1_agreement': float((reference_top1 == candidate_top1).mean()),
+        'max_abs_prob_delta': float(np.abs(reference - candidate).max()),
+        'mean_abs_confidence_delta': float(np.abs(reference.max(axis=1) - candidate.max(axis=1)).mean()),
+    }
+    
+    labelled = [i for i, label in enumerate(labels) if label is not None]
+    if labelled:
+        truth = np.array([labels[i] for i in labelled])
+        report['labelled_images'] = len(labelled)
+        report['reference_accuracy'] = float((reference_top1[labelled] == truth).mean())
+        report['candidate_accuracy'] = float((candidate_top1[labelled] == truth).mean())
+    return report
+
+def print_report(report: Dict, reference_name: str, candidate_name: str):
+    print(f"Images compared:          {report['images']}")
+    print(f"Top-1 agreement:          {report['top1_agreement'] * 100:.2f}%")
+    print(f"Max |prob delta|:         {report['max_abs_prob_delta']:.5f}")
+    print(f"Mean |confidence delta|:  {report['mean_abs_confidence_delta']:.5f}")
+    if 'labelled_images' in report:
+        print(f"{reference_name} accuracy: {report['reference_accuracy'] * 100:.2f}% ({report['labelled_images']} labelled)")
+        print(f"{candidate_name} accuracy: {report['candidate_accuracy'] * 100:.2f}%")
@@ -0,0 +1,69 @@
+"""
+Measure the accuracy/latency trade-off of the int8 quantized disease model.
+
+Runs a held-out image set through the float model and its dynamically
+quantized counterpart and reports top-1 agreement, probability drift,
+accuracy (when images sit in per-class sub-directories named by class
+index or disease name), latency and serialized model size.
+
+Usage (from the server directory):
+    python -m scripts.quantization_parity --images path/to/holdout --min-agreement 0.98
+"""
+import argparse
+import copy
+import io
+import sys
+
+import torch
+
+from app.services.disease_detection import disease_detection_service
+from scripts.image_sets import load_labeled_images, synthetic_images
+from scripts.parity import compare, label_to_class, predict_with, preprocess_all, print_report, run_batched, use_eager_float_model
+
+def serialized_size_mb(model: torch.nn.Module) -> float:
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / (1024 * 1024)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--images', help='Held-out image directory (optionally one sub-directory per class)')
+    parser.add_argument('--limit', type=int, default=1000)
+    parser.add_argument('--synthetic', type=int, default=32, help='Synthetic images to use when --images is not given')
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--min-agreement', type=float, default=0.0, help='Exit non-zero if top-1 agreement falls below this (0-1)')
+    args = parser.parse_args()
+    
+    use_eager_float_model()
+    service = disease_detection_service
+    service.ensure_loaded()
+    if service.model is None:
+        parser.error('No model loaded - check MODEL_DIR')
+    
+    if args.images:
+        samples = load_labeled_images(args.images, args.limit)
+    else:
+        samples = [(image_data, None) for image_data in synthetic_images(args.synthetic, 640, 480)]
+    if not samples:
+        parser.error('No images found')
+    
+    inputs = preprocess_all(service, [image_data for image_data, _ in samples])
+    labels = [label_to_class(service, label) for _, label in samples]
+    
+    float_model = service.model
+    quantized_model = service.quantize_model(copy.deepcopy(float_model))
+    
+    reference, float_latency = run_batched(predict_with(float_model), inputs, args.batch_size)
+    candidate, int8_latency = run_batched(predict_with(quantized_model), inputs, args.batch_size)
+    report = compare(reference, candidate, labels)
+    
+    print_report(report, 'float32', 'int8')
+    print(f"Latency per image:        float32 {float_latency * 1000:.2f}ms, int8 {int8_latency * 1000:.2f}ms")
+    print(f"Model size:               float32 {serialized_size_mb(float_model):.1f}MB, int8 {serialized_size_mb(quantized_model):.1f}MB")
+    
+    if report['top1_agreement'] < args.min_agreement:
+        print(f"FAIL: top-1 agreement below {args.min_agreement * 100:.1f}%")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()